@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the cost of mixing a chunk of audio with a growing number of voices
+playing (Mixer.update), and of the Player flush (resampling and volume),
+against the duration of a chunk.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import math
+import struct
+
+VOICES = (1, 8, 32)
+CHUNKS = 200
+SOUND_DURATION = 2
+
+
+def create_samples(player, frequency):
+    frames = player.framerate * SOUND_DURATION
+    return b"".join(struct.pack("<hh", value, value) for value in \
+        (int(8000 * math.sin(2 * math.pi * frequency * i / player.framerate)) \
+        for i in range(frames)))
+
+
+def run():
+    common.setup_headless()
+
+    from lemapi.audio import Mixer, Player, Sound
+
+    # The player thread is not started, chunks are mixed by the benchmark
+    player = Player()
+    chunk_duration = player.chunk_size / player.framerate
+    samples = [create_samples(player, 220 * (i + 1)) for i in range(4)]
+
+    results = {"chunk_duration": chunk_duration}
+    for nb_voices in VOICES:
+        mixer = Mixer(player)
+        for i in range(nb_voices):
+            sound = Sound(player)
+            sound.samples = samples[i % len(samples)]
+            sound.loaded = True
+            sound.set_play_count(-1)
+            sound.play()
+            mixer.add_sound(sound)
+
+        def mix():
+            for i in range(CHUNKS):
+                mixer.update()
+                player.buffer = bytes(player.get_chunk_size())
+
+        mix_time = common.measure(mix, repeat=3)["median"] / CHUNKS
+        results["voices_%s" % nb_voices] = {
+            "mix_time": mix_time,
+            "chunk_load": mix_time / chunk_duration
+        }
+
+    # Flushing blocks on the fake stream for the duration of the chunk
+    stream_write = player.stream.write
+    player.stream.write = lambda data: None
+    results["flush_time"] = common.measure(player.flush, repeat=5, \
+        number=CHUNKS)["median"]
+    player.stream.write = stream_write
+    return results
+
+
+if __name__ == "__main__":
+    common.report("audio", run())
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the time and the memory needed to load the desktop images, with
+every theme loaded eagerly or only the active one (others being loaded on
+first use), decoded from PNG files or mapped from the asset pack.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODES = ("eager", "lazy", "packed")
+
+
+def load(mode):
+    common.setup_headless()
+    gui = common.create_gui()
+
+    from lemapi.api import get_default_settings, set_settings
+    from lemapi.asset_pack import get_pack_sources, open_asset_pack
+    from lemapi.constants import Path
+    from lemapi_desktop.util import load_images
+
+    set_settings(get_default_settings())
+    if mode == "packed":
+        # Built (if outdated) before measuring, like after a first boot
+        gui.asset_pack = open_asset_pack(Path.ASSET_PACK, \
+            *get_pack_sources(Path.DATA))
+    rss = common.get_rss()
+
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            load_images(all_themes=mode != "lazy")
+            elapsed = time.perf_counter() - start
+
+    return {
+        "load_time": elapsed,
+        "rss_growth": common.get_rss() - rss,
+        "images": len(gui.images),
+        "images_bytes": gui.get_images_bytesize()
+    }
+
+
+def run():
+    # Each mode runs in a fresh process so that memory numbers are comparable
+    results = {}
+    for mode in MODES:
+        output = subprocess.check_output([sys.executable, __file__, mode])
+        results[mode] = json.loads(output.decode().splitlines()[-1])
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in MODES:
+        print(json.dumps(load(sys.argv[1])))
+    else:
+        common.report("boot", run())
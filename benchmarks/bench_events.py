@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the latency between posting events to the SDL queue and their
+dispatch to the view of the current activity by the event bus, and check
+that every event is delivered in order. Also measure the cost of mouse
+motions over a grid of buttons, with and without motion coalescing, and
+the cost of hit testing with and without the spatial index of the view.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import time
+
+BATCHES = (1, 10, 100)
+FRAMES = 200
+MOTIONS_PER_FRAME = 20
+GRID = (8, 5)
+HIT_TEST_GRID = (20, 12)
+HIT_TEST_EVENTS = 2000
+LISTENERS = (10, 100, 1000)
+LISTENER_EVENTS = 2000
+
+
+def run():
+    common.setup_headless()
+    common.create_gui()
+
+    import pygame
+    from lemapi.activity import Activity
+    from lemapi.event_manager import Event_bus, Listener_manager
+    from lemapi.system_instance import Instance
+    from lemapi.view import View
+
+    class Recording_view(View):
+        def __init__(self):
+            super().__init__()
+            self.received = []
+
+        def updateEvent(self, event):
+            self.received.append((event.index, time.perf_counter() - event.sent))
+
+    Instance.listener_manager = Listener_manager()
+    bus = Event_bus()
+    results = {}
+
+    for batch in BATCHES:
+        view = Recording_view()
+        Instance.activities[:] = [Activity(view)]
+        pygame.event.clear()
+        posted = 0
+
+        for frame in range(FRAMES):
+            for i in range(batch):
+                pygame.event.post(pygame.event.Event(pygame.USEREVENT, \
+                    index=posted, sent=time.perf_counter()))
+                posted += 1
+            bus.update()
+
+        latencies = sorted(latency for index, latency in view.received)
+        results["batch_%s" % batch] = {
+            "posted": posted,
+            "delivered": len(view.received),
+            "ordered": [index for index, latency in view.received] \
+                == list(range(posted)),
+            "latency_median": latencies[len(latencies) // 2],
+            "latency_max": latencies[-1]
+        }
+
+    results["motion"] = run_motion(bus)
+    results["hit_test"] = run_hit_test()
+    results["listeners"] = run_listeners()
+    Instance.activities.clear()
+    return results
+
+
+def run_motion(bus):
+    import pygame
+    from lemapi.activity import Activity
+    from lemapi.event_manager import Event
+    from lemapi.system_instance import Instance
+    from lemapi.view import View
+    from lemapi.widget import Button
+
+    callbacks = [0]
+
+    def count():
+        callbacks[0] += 1
+
+    view = View()
+    w, h = Instance.gui.get_size()
+    columns, rows = GRID
+    size = (w // columns, h // rows)
+    for i in range(columns * rows):
+        pos = (i % columns * size[0], i // columns * size[1])
+        view.add_widget("button_%s" % i, Button, pos, size=size)
+        view.widgets["button_%s" % i].hoverEvents.append(Event(count))
+        view.widgets["button_%s" % i].endHoverEvents.append(Event(count))
+    Instance.activities[:] = [Activity(view)]
+
+    def frames():
+        for frame in range(FRAMES):
+            for i in range(MOTIONS_PER_FRAME):
+                x = (frame * MOTIONS_PER_FRAME + i) * 7 % w
+                pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, \
+                    pos=(x, x * h // w), rel=(7, 0), buttons=(0, 0, 0)))
+            bus.update()
+
+    results = {}
+    for mode, coalesce in (("raw", False), ("coalesced", True)):
+        bus.coalesce_motion = coalesce
+        callbacks[0] = 0
+        start = time.perf_counter()
+        frames()
+        elapsed = time.perf_counter() - start
+        results[mode] = {
+            "frame_time": elapsed / FRAMES,
+            "event_time": elapsed / FRAMES / MOTIONS_PER_FRAME,
+            "hover_callbacks": callbacks[0]
+        }
+    return results
+
+
+def run_hit_test():
+    import pygame
+    from lemapi.system_instance import Instance
+    from lemapi.view import View
+    from lemapi.widget import Button
+
+    class Linear_view(View):
+        # Dispatch of the views before the spatial index
+        def updateEvent(self, event):
+            for widget in tuple(self.widgets.values()):
+                widget.onEvent(event)
+
+    w, h = Instance.gui.get_size()
+    columns, rows = HIT_TEST_GRID
+    size = (w // columns, h // rows)
+    events = []
+    for i in range(HIT_TEST_EVENTS):
+        x = i * 7 % w
+        events.append(pygame.event.Event(pygame.MOUSEMOTION, \
+            pos=(x, x * h // w), rel=(7, 0), buttons=(0, 0, 0)))
+
+    results = {}
+    for mode, view_class in (("linear", Linear_view), ("indexed", View)):
+        view = view_class()
+        for i in range(columns * rows):
+            pos = (i % columns * size[0], i // columns * size[1])
+            view.add_widget("button_%s" % i, Button, pos, size=size)
+
+        def dispatch():
+            for event in events:
+                view.updateEvent(event)
+
+        timings = common.measure(dispatch, repeat=3)
+        results[mode] = {
+            "widgets": columns * rows,
+            "event_time": timings["median"] / HIT_TEST_EVENTS
+        }
+        view.destroy()
+    return results
+
+
+def run_listeners():
+    import pygame
+    from lemapi.event_manager import Event, Listener_manager
+
+    calls = [0]
+
+    def count():
+        calls[0] += 1
+
+    keys = list(range(pygame.K_a, pygame.K_z + 1))
+    events = []
+    for i in range(LISTENER_EVENTS):
+        # Each key is pressed then released
+        key = keys[i // 2 % len(keys)]
+        type = pygame.KEYDOWN if i % 2 == 0 else pygame.KEYUP
+        events.append(pygame.event.Event(type, key=key, mod=0, unicode=""))
+
+    results = {}
+    for nb_listeners in LISTENERS:
+        listener_manager = Listener_manager()
+        for i in range(nb_listeners):
+            key = keys[i % len(keys)]
+            if i % 2:
+                listener_manager.km.add_key_down_event(Event(count), key)
+            else:
+                listener_manager.km.add_key_up_event(Event(count), key)
+
+        def dispatch():
+            for event in events:
+                listener_manager.on_event(event, 0)
+
+        calls[0] = 0
+        timings = common.measure(dispatch, repeat=3)
+        results["listeners_%s" % nb_listeners] = {
+            "event_time": timings["median"] / LISTENER_EVENTS,
+            "calls_per_event": calls[0] / 3 / LISTENER_EVENTS
+        }
+    return results
+
+
+if __name__ == "__main__":
+    common.report("events", run())
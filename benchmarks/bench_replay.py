@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+Replay a scripted desktop session (waiting for the splash, dragging the
+App_group, browsing apps with the keyboard and the joystick) headless through
+main.py, and report its frame times. A log recorded with
+"main.py --record LOG" can be replayed instead by giving its path.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from os.path import join
+
+DELTATIME = 1 / 60
+SPLASH_FRAMES = 300
+REPEAT = 3
+
+
+def build_session(path):
+    common.setup_headless()
+
+    import pygame
+    from lemapi.event_manager import Control_state
+    from lemapi.replay import Input_recorder
+    from pygame.locals import KEYDOWN, KEYUP, K_DOWN, K_UP, MOUSEBUTTONDOWN, \
+        MOUSEBUTTONUP, MOUSEMOTION
+
+    recorder = Input_recorder(path)
+
+    def frame(*events, state=None):
+        recorder.add_events([pygame.event.Event(type, attributes) for type, \
+            attributes in events])
+        recorder.write_frame(DELTATIME, state)
+
+    def idle(frames):
+        for i in range(frames):
+            frame()
+
+    idle(SPLASH_FRAMES)
+
+    # Drag of the App_group, out of its app widgets so that no app is opened
+    frame((MOUSEBUTTONDOWN, {"pos": (780, 100), "button": 1}))
+    for i in range(1, 31):
+        frame((MOUSEMOTION, {"pos": (780, 100 + i * 4), "rel": (0, 4), \
+            "buttons": (1, 0, 0)}))
+    frame((MOUSEBUTTONUP, {"pos": (780, 220), "button": 1}))
+    idle(30)
+
+    for key in (K_UP, K_UP, K_DOWN, K_UP, K_DOWN, K_DOWN):
+        attributes = {"key": key, "mod": 0, "unicode": "", "scancode": 0}
+        frame((KEYDOWN, attributes))
+        idle(5)
+        frame((KEYUP, attributes))
+        idle(25)
+
+    for joy_y in (1, 0, -1, 0, 1, 0):
+        frame(state=Control_state(0, 0, joy_y, frozenset()))
+        for i in range(29):
+            frame(state=Control_state(0, 0, joy_y, frozenset()))
+
+    idle(60)
+    recorder.close()
+
+
+def replay(path):
+    with tempfile.TemporaryDirectory() as directory:
+        report_path = join(directory, "report.json")
+        with open(os.devnull, "w") as devnull:
+            subprocess.check_call([sys.executable, join(common.ROOT, \
+                "main.py"), "--headless", "--replay", path, "--report", \
+                report_path], stdout=devnull)
+        with open(report_path, "r") as file:
+            return json.load(file)
+
+
+def run(path=None):
+    with tempfile.TemporaryDirectory() as directory:
+        if not path:
+            path = join(directory, "session.lemrec")
+            build_session(path)
+
+        reports = [replay(path) for i in range(REPEAT)]
+        reports.sort(key=lambda report: report["total_time"])
+        results = reports[len(reports) // 2]
+        results["log_bytes"] = os.path.getsize(path)
+        results["log"] = os.path.basename(path)
+        return results
+
+
+if __name__ == "__main__":
+    common.report("replay", run(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the cost of a frame of the spinning widgets (splash labyrinth, app
+group background and waiting wheel), rotating each frame or drawing from the
+rotation and spinner caches, and of the app group repainted at rest.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+FRAMES = 360
+SPEED = 4
+
+
+def spin(widget, set_angle):
+    def frames():
+        for i in range(FRAMES):
+            set_angle(widget, i * SPEED)
+            widget.update()
+    return frames
+
+
+def run():
+    common.setup_headless()
+    gui = common.create_gui()
+
+    from lemapi.api import get_default_settings, set_settings
+    from lemapi.cache import rotation_cache, spinner_cache
+    from lemapi.constants import App
+    from lemapi.widget import Waiting_wheel
+    from lemapi_desktop.widget import App_group, Splash_labyrinth
+
+    set_settings(get_default_settings())
+    w, h = gui.get_size()
+    widgets = {
+        "splash_labyrinth": (Splash_labyrinth(gui, (w // 2, h // 2), \
+            size=(h * 0.8, h * 0.8), anchor=(0, 0)), \
+            lambda widget, angle: setattr(widget, "angle", angle)),
+        "app_group": (App_group(gui, (w, h // 2), anchor=(0, 0)), \
+            lambda widget, angle: setattr(widget, "angle", angle / 180)),
+        "waiting_wheel": (Waiting_wheel(gui, (w // 2, h // 2), size=(80, 80)), \
+            lambda widget, angle: widget.rotate(SPEED))
+    }
+
+    results = {}
+    steps = (App.ROTATION_STEP, App.SPINNER_ROTATION_STEP)
+    for name, (widget, set_angle) in widgets.items():
+        results[name] = {}
+        for mode, mode_steps in (("uncached", (0, 0)), ("cached", steps)):
+            App.ROTATION_STEP, App.SPINNER_ROTATION_STEP = mode_steps
+            for cache in (rotation_cache, spinner_cache):
+                cache.clear()
+                cache.reset_stats()
+
+            # The first turn fills the caches, the measured ones draw from them
+            spin(widget, set_angle)()
+            timings = common.measure(spin(widget, set_angle), repeat=3)
+            results[name][mode] = {
+                "frame_time": timings["median"] / FRAMES,
+                "cache": rotation_cache.get_stats(),
+                "spinner_cache": spinner_cache.get_stats()
+            }
+    App.ROTATION_STEP, App.SPINNER_ROTATION_STEP = steps
+
+    # Repaints of the app group at rest (like under a hovered app widget)
+    widget = widgets["app_group"][0]
+    results["app_group"]["resting"] = {
+        "frame_time": common.measure(spin(widget, lambda widget, angle: \
+            None), repeat=3)["median"] / FRAMES
+    }
+    return results
+
+
+if __name__ == "__main__":
+    common.report("rotation", run())
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the cost of a Task_manager frame with thousands of pending delayed
+tasks (or coroutines waiting for a delay) and a few animations, and the cost
+of cancelling them.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import time
+
+TIMERS = (100, 1000, 10000)
+ANIMATIONS = 10
+FRAMES = 1000
+DELTATIME = 1 / 60
+
+
+def run():
+    common.setup_headless()
+
+    from lemapi.task_manager import Analog_task_delay, Delay, Task_delay, \
+        Task_manager
+
+    def nothing(*args):
+        pass
+
+    async def sleeper(delay):
+        while True:
+            await Delay(delay)
+
+    results = {}
+    for name in ("timers", "coroutines"):
+        for nb_timers in TIMERS:
+            task_manager = Task_manager()
+            delays = [30 + i / nb_timers for i in range(nb_timers)]
+            if name == "timers":
+                handles = [task_manager.add_task(None, Task_delay(delay, \
+                    nothing)) for delay in delays]
+            else:
+                handles = [task_manager.add_coroutine(None, sleeper(delay)) \
+                    for delay in delays]
+            for i in range(ANIMATIONS):
+                task_manager.add_task(None, Analog_task_delay(FRAMES, nothing))
+
+            start = time.perf_counter()
+            for frame in range(FRAMES):
+                task_manager.update(DELTATIME)
+            frame_time = (time.perf_counter() - start) / FRAMES
+
+            start = time.perf_counter()
+            for handle in handles:
+                task_manager.cancel(handle)
+            cancel_time = (time.perf_counter() - start) / nb_timers
+
+            results["%s_%s" % (name, nb_timers)] = {
+                "frame_time": frame_time,
+                "cancel_time": cancel_time
+            }
+    return results
+
+
+if __name__ == "__main__":
+    common.report("tasks", run())
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure the hot paths of the widgets on their own: Text rendering,
+nine-slice stretching, Button construction, Virtual_keyboard building and
+Scrollable_group scrolling with a growing number of children.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import contextlib
+import os
+
+TEXTS = 200
+STRETCH_SIZES = ((120, 40), (200, 60), (300, 90), (400, 120), (800, 150))
+BUTTONS = 50
+CHILDREN = (10, 100, 1000)
+SCROLL_FRAMES = 50
+
+
+def run_text(gui):
+    from lemapi.cache import text_cache
+    from lemapi.widget import Text
+
+    text = Text(gui, (10, 10), "")
+    counter = [0]
+
+    def render_new():
+        # A text never rendered before each call
+        counter[0] += 1
+        text.text = "LemAPI text %s" % counter[0]
+        text.update()
+
+    def render_cached():
+        for i in range(TEXTS):
+            text.text = "LemAPI text %s" % (i % 10)
+            text.update()
+
+    text_cache.clear()
+    render_cached()
+    return {
+        "render_time": common.measure(render_new, repeat=5, number=TEXTS) \
+            ["median"],
+        "cached_time": common.measure(render_cached, repeat=5)["median"] \
+            / TEXTS
+    }
+
+
+def run_stretch(gui):
+    from lemapi.cache import stretch_cache
+    from lemapi.constants import Path
+    from lemapi.util import stretch_image
+    from os.path import join
+
+    path = join(Path.IMAGES, "button", "white", "normal.png")
+    gui.load_image(path)
+    image = gui.get_image(path)
+
+    def stretch():
+        for size in STRETCH_SIZES:
+            stretch_image(image, size, 16)
+
+    def stretch_uncached():
+        stretch_cache.clear()
+        stretch()
+
+    return {
+        "stretch_time": common.measure(stretch_uncached, repeat=5)["median"] \
+            / len(STRETCH_SIZES),
+        "cached_time": common.measure(stretch, repeat=5)["median"] \
+            / len(STRETCH_SIZES)
+    }
+
+
+def run_button(gui):
+    from lemapi.widget import Button
+
+    def build():
+        for i in range(BUTTONS):
+            Button(gui, (i * 10, 10), text="Button %s" % i, size=(120, 40))
+
+    return {
+        "build_time": common.measure(build, repeat=5)["median"] / BUTTONS
+    }
+
+
+def run_keyboard(gui):
+    from lemapi.widget import Virtual_keyboard
+
+    def build():
+        keyboard = Virtual_keyboard(gui, (0, 330))
+        keyboard.destroy()
+
+    return {
+        "build_time": common.measure(build, repeat=5)["median"]
+    }
+
+
+def run_scroll(gui):
+    from lemapi.widget import Scrollable_group, Text
+
+    results = {}
+    for children in CHILDREN:
+        group = Scrollable_group(gui, (100, 40), size=(600, 400))
+        for i in range(children):
+            group.addSubWidget("text_%s" % i, Text, (10, i * 30), \
+                "Child %s" % i)
+        group.update()
+
+        def scroll():
+            for frame in range(SCROLL_FRAMES):
+                group.scroll((0, -10 if frame < SCROLL_FRAMES // 2 else 10))
+                group.update()
+
+        results["children_%s" % children] = {
+            "frame_time": common.measure(scroll, repeat=3)["median"] \
+                / SCROLL_FRAMES
+        }
+        group.destroy()
+    return results
+
+
+def run():
+    common.setup_headless()
+    gui = common.create_gui()
+
+    from lemapi.api import get_default_settings, set_settings
+
+    set_settings(get_default_settings())
+    # Widgets log their image loads and warnings
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            return {
+                "text": run_text(gui),
+                "stretch_image": run_stretch(gui),
+                "button": run_button(gui),
+                "virtual_keyboard": run_keyboard(gui),
+                "scrollable_group": run_scroll(gui)
+            }
+
+
+if __name__ == "__main__":
+    common.report("widgets", run())
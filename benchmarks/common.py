@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides helpers shared by the LemAPI benchmarks. Benchmarks run headless
+with the SDL dummy drivers and fake pyaudio, gpiozero and gi modules (in
+fakes/), and print their results as JSON.
+
+Created on 18/10/2026
+"""
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import json
+import os
+import resource
+import sys
+import time
+
+from os.path import abspath, dirname, join
+
+ROOT = dirname(dirname(abspath(__file__)))
+FAKES = join(dirname(abspath(__file__)), "fakes")
+# Set by run.py, which collects the results of each benchmark from this file
+OUTPUT_VARIABLE = "LEMAPI_BENCHMARK_OUTPUT"
+
+
+def setup_headless():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+    # Also used by the processes started by the benchmarks
+    paths = os.environ.get("PYTHONPATH", "").split(os.pathsep)
+    if FAKES not in paths:
+        os.environ["PYTHONPATH"] = os.pathsep.join([FAKES] + [path for \
+            path in paths if path])
+    if FAKES not in sys.path:
+        sys.path.insert(0, FAKES)
+
+    # lemapi.constants.Path is computed from the main script location
+    sys.argv[0] = join(ROOT, "main.py")
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def create_gui():
+    import pygame
+    from lemapi.gui import GUI
+    from lemapi.system_instance import Instance
+
+    pygame.init()
+    Instance.gui = GUI()
+    Instance.gui.create_root_surface()
+    return Instance.gui
+
+
+def measure(fct, repeat=5, number=1):
+    """
+    Call fct number times, repeat times, and return timings in seconds for
+    one call.
+    """
+
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            fct()
+        timings.append((time.perf_counter() - start) / number)
+
+    timings.sort()
+    return {
+        "min": timings[0],
+        "median": timings[len(timings) // 2],
+        "mean": sum(timings) / len(timings)
+    }
+
+
+def get_rss():
+    """
+    Return the current resident set size of the process in bytes.
+    """
+
+    try:
+        with open("/proc/self/statm", "r") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def report(name, results):
+    report = {"benchmark": name, "results": results}
+    print(json.dumps(report, indent="\t"))
+
+    path = os.environ.get(OUTPUT_VARIABLE)
+    if path:
+        with open(path, "w") as file:
+            json.dump(report, file)
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fake gi module for the benchmarks, giving the screen of the SDL dummy
+driver to lemapi.util.
+
+Created on 18/10/2026
+"""
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+
+def require_version(namespace, version):
+    pass
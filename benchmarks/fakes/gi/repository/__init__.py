@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fake Gdk of the gi module for the benchmarks.
+
+Created on 18/10/2026
+"""
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+SCREEN_SIZE = (800, 480)
+MONITOR_SIZE_MM = (154, 86)
+
+
+class Monitor(object):
+    def get_width_mm(self):
+        return MONITOR_SIZE_MM[0]
+
+    def get_height_mm(self):
+        return MONITOR_SIZE_MM[1]
+
+
+class Display(object):
+    @staticmethod
+    def get_default():
+        return Display()
+
+    def get_monitor(self, index):
+        return Monitor()
+
+
+class Screen(object):
+    @staticmethod
+    def get_default():
+        return Screen()
+
+    def get_width(self):
+        return SCREEN_SIZE[0]
+
+    def get_height(self):
+        return SCREEN_SIZE[1]
+
+
+class Gdk(object):
+    Display = Display
+    Screen = Screen
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fake gpiozero module for the benchmarks: a joystick at rest and released
+buttons, whose values can be set by the benchmarks.
+
+Created on 18/10/2026
+"""
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+
+class Device(object):
+    def __init__(self, pin, pin_factory=None, **kwargs):
+        self.pin = pin
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class MCP3008(Device):
+    def __init__(self, channel=0, pin_factory=None, **kwargs):
+        super().__init__(channel, pin_factory)
+        self.value = 0.5
+
+
+class Button(Device):
+    def __init__(self, pin, pin_factory=None, **kwargs):
+        super().__init__(pin, pin_factory)
+        self.is_pressed = False
+        self.when_pressed = None
+        self.when_released = None
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fake pyaudio module for the benchmarks: streams accept the chunks written by
+the audio Player and block for their duration, like a sound card.
+
+Created on 18/10/2026
+"""
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import time
+
+
+class Stream(object):
+    def __init__(self, format=2, rate=22050, channels=2, **kwargs):
+        self.frame_size = format * channels
+        self.rate = rate
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        time.sleep(len(data) / self.frame_size / self.rate)
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PyAudio(object):
+    def get_format_from_width(self, width):
+        # Formats of the fake are sample widths
+        return width
+
+    def open(self, **kwargs):
+        return Stream(**kwargs)
+
+    def terminate(self):
+        pass
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""
+Run the LemAPI benchmarks (bench_*.py), each in its own process, write their
+results to a JSON file and compare them with a baseline.
+
+    python run.py [NAME ...] [--output FILE] [--baseline FILE]
+        [--save-baseline] [--tolerance RATIO]
+
+Timings (and memory sizes) are compared with the baseline: a benchmark whose
+value grew by more than the tolerance is a regression, and the exit status is
+1 if there is any. Baselines depend on the machine, they are saved with
+--save-baseline on the machine they are compared on.
+
+Created on 18/10/2026
+"""
+
+import common
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+
+from os.path import basename, dirname, abspath, exists, join
+
+BENCHMARKS = dirname(abspath(__file__))
+DEFAULT_BASELINE = join(BENCHMARKS, "baseline.json")
+DEFAULT_TOLERANCE = 0.15
+# Values where lower is better, and where higher is better, the others
+# (counts, flags) are not compared
+LOWER_BETTER = re.compile(r"(time|latency|min|median|mean|max|p95|load|rss|" \
+    + r"bytes)")
+HIGHER_BETTER = re.compile(r"fps")
+
+
+def get_benchmarks(names=None):
+    paths = sorted(glob.glob(join(BENCHMARKS, "bench_*.py")))
+    benchmarks = {basename(path)[len("bench_"):-len(".py")]: path for path \
+        in paths}
+    if not names:
+        return benchmarks
+
+    unknown = [name for name in names if name not in benchmarks]
+    if unknown:
+        raise SystemExit("Unknown benchmarks: %s (available: %s)" % \
+            (", ".join(unknown), ", ".join(benchmarks)))
+    return {name: benchmarks[name] for name in names}
+
+
+def run_benchmark(name, path):
+    with tempfile.TemporaryDirectory() as directory:
+        output = join(directory, "%s.json" % name)
+        env = dict(os.environ, **{common.OUTPUT_VARIABLE: output})
+        with open(os.devnull, "w") as devnull:
+            code = subprocess.call([sys.executable, path], cwd=BENCHMARKS, \
+                env=env, stdout=devnull)
+
+        if code or not exists(output):
+            print("[benchmarks] [WARNING] %s failed (exit status %s)" % \
+                (name, code))
+            return None
+        with open(output, "r") as file:
+            return json.load(file)["results"]
+
+
+def run(names=None):
+    common.setup_headless()
+
+    results = {}
+    for name, path in get_benchmarks(names).items():
+        print("[benchmarks] [INFO] Running %s ..." % name, flush=True)
+        result = run_benchmark(name, path)
+        if result is not None:
+            results[name] = result
+
+    import pygame
+
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "benchmarks": results
+    }
+
+
+def flatten(results, prefix=""):
+    """
+    Return the numeric values of nested results, by dotted path.
+    """
+
+    values = {}
+    for key, value in results.items():
+        path = "%s.%s" % (prefix, key) if prefix else str(key)
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return the (path, baseline value, value, ratio) of the compared values
+    of results found in baseline, and the paths of the regressions. A ratio
+    above 1 is always a slowdown, whether the value is lower or higher is
+    better.
+    """
+
+    values = flatten(results["benchmarks"])
+    baseline_values = flatten(baseline["benchmarks"])
+    comparisons = []
+    regressions = []
+
+    for path, value in values.items():
+        base = baseline_values.get(path)
+        key = path.rsplit(".", 1)[-1]
+        if base is None:
+            continue
+        if HIGHER_BETTER.search(key):
+            value, base = base, value
+        elif not LOWER_BETTER.search(key):
+            continue
+
+        ratio = value / base if base else (1 if not value else float("inf"))
+        if HIGHER_BETTER.search(key):
+            value, base = base, value
+        comparisons.append((path, base, value, ratio))
+        if ratio > 1 + tolerance:
+            regressions.append(path)
+    return comparisons, regressions
+
+
+def print_comparison(comparisons, regressions, tolerance):
+    width = max([len(path) for path, base, value, ratio in comparisons] + [4])
+    for path, base, value, ratio in comparisons:
+        if path in regressions:
+            status = "REGRESSION"
+        elif ratio < 1 - tolerance:
+            status = "improved"
+        else:
+            status = ""
+        print("%s  %12.6g  %12.6g  %6.2fx  %s" % (path.ljust(width), base, \
+            value, ratio, status))
+    print("[benchmarks] [INFO] %s values compared, %s regressions " % \
+        (len(comparisons), len(regressions)) + "(tolerance %d %%)" % \
+        (tolerance * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the LemAPI benchmarks")
+    parser.add_argument("names", metavar="NAME", nargs="*", \
+        help="benchmarks to run (all by default), like 'tasks' for " \
+        + "bench_tasks.py")
+    parser.add_argument("--output", metavar="FILE", \
+        help="write the results to FILE (JSON)")
+    parser.add_argument("--baseline", metavar="FILE", \
+        default=DEFAULT_BASELINE, help="baseline to compare with " \
+        + "(default: baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", \
+        help="save the results as the baseline instead of comparing them")
+    parser.add_argument("--tolerance", metavar="RATIO", type=float, \
+        default=DEFAULT_TOLERANCE, help="growth of a timing over the " \
+        + "baseline reported as a regression (default: %s)" % \
+        DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.names)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent="\t")
+
+    if args.save_baseline:
+        # Benchmarks not run keep their baseline
+        if exists(args.baseline):
+            with open(args.baseline, "r") as file:
+                baseline = json.load(file)
+            baseline["benchmarks"].update(results["benchmarks"])
+            results = dict(results, benchmarks=baseline["benchmarks"])
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent="\t")
+        print("[benchmarks] [INFO] Baseline saved to '%s'" % args.baseline)
+        return 0
+
+    if not exists(args.baseline):
+        print("[benchmarks] [INFO] No baseline in '%s', " % args.baseline \
+            + "nothing to compare with")
+        if not args.output:
+            print(json.dumps(results, indent="\t"))
+        return 0
+
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)
+    comparisons, regressions = compare(results, baseline, args.tolerance)
+    print_comparison(comparisons, regressions, args.tolerance)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
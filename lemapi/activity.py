@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from lemapi.event_manager import Listener_manager
+from lemapi.system_instance import Instance
 
 __author__ = "Julien Dubois"
 __version__ = "0.1.0"
@@ -9,10 +10,13 @@ __version__ = "0.1.0"
 class Activity(object):
     def __init__(self, view):
         self.view = view
+        # Set by activities whose view changes without tasks nor inputs (like
+        # audio-driven views), so that the main loop never idles
+        self.keep_awake = False
         self.listener_manager = Listener_manager()
+        self.sync_inputs()
 
     def update(self, deltatime):
-        self.listener_manager.update()
         self.view.update()
 
     def sleep(self):
@@ -20,6 +24,14 @@ class Activity(object):
 
     def wakeup(self):
         self.listener_manager.enable = True
+        self.sync_inputs()
+
+    def sync_inputs(self):
+        # Keys and buttons may have changed while the activity did not get
+        # events
+        if Instance.listener_manager:
+            self.listener_manager.km.sync(Instance.listener_manager.km)
+            self.listener_manager.cm.sync(Instance.listener_manager.cm)
 
     def destroy(self):
         self.view.destroy()
@@ -71,6 +71,23 @@ def get_global_listener_manager():
     return Instance.listener_manager
 
 
+def get_event_bus():
+    from lemapi.event_manager import Event_bus
+
+    if not Instance.event_bus:
+        Instance.event_bus = Event_bus()
+    return Instance.event_bus
+
+
+def get_control_sampler():
+    from lemapi.event_manager import Control_sampler
+
+    if not Instance.control_sampler:
+        Instance.control_sampler = Control_sampler()
+        Instance.control_sampler.start()
+    return Instance.control_sampler
+
+
 def get_task_manager():
     from lemapi.task_manager import Task_manager
 
@@ -79,6 +96,13 @@ def get_task_manager():
     return Instance.task_manager
 
 
+def get_interpolation_alpha():
+    # Position of the rendered frame between two fixed simulation steps
+    if Instance.main_loop:
+        return Instance.main_loop.alpha
+    return 1
+
+
 def get_activity():
     return Instance.activities[-1]
 
@@ -131,6 +155,60 @@ def stop_audio_player():
         print("[lemapi] [INFO] [stop_audio_player] No player to stop")
 
 
+def stop_control_sampler():
+    if Instance.control_sampler:
+        Instance.control_sampler.stop()
+        Instance.control_sampler = None
+
+
+def start_latency_tracer(target):
+    from lemapi.latency import Latency_tracer
+
+    stop_latency_tracer()
+    Instance.latency_tracer = Latency_tracer(target)
+    return Instance.latency_tracer
+
+
+def stop_latency_tracer():
+    if Instance.latency_tracer:
+        Instance.latency_tracer.close()
+        Instance.latency_tracer = None
+
+
+def start_profiler(trace_path=None, overlay=True):
+    """
+    Start to profile the frames. Left Ctrl + P toggles the overlay, and Left
+    Ctrl + T writes the Chrome trace to trace_path (also written when the
+    profiler is stopped).
+    """
+
+    from lemapi.event_manager import Event
+    from lemapi.profiler import Frame_profiler
+    from pygame.locals import K_LCTRL, K_p, K_t
+
+    stop_profiler()
+    profiler = Frame_profiler(trace_path, overlay)
+    km = get_global_listener_manager().km
+    profiler.listeners = (
+        km.add_key_down_event(Event(profiler.toggle_overlay), K_p, K_LCTRL, \
+            copy=False),
+        km.add_key_down_event(Event(profiler.dump_trace), K_t, K_LCTRL, \
+            copy=False)
+    )
+    Instance.profiler = profiler
+    return profiler
+
+
+def stop_profiler():
+    profiler = Instance.profiler
+    if profiler:
+        Instance.profiler = None
+        for listener in profiler.listeners:
+            get_global_listener_manager().remove_listener(listener)
+        if profiler.trace_path:
+            profiler.dump_trace()
+
+
 def get_app_id():
     if Instance.app:
         return Instance.app.id
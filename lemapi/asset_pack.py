@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides a binary pack holding decoded images and sound samples. The pack is
+memory-mapped on boot so that surfaces and samples are created from it
+without decoding PNG or WAV files again.
+
+Created on 18/10/2026
+"""
+
+from lemapi.util import read_json
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import json
+import mmap
+import os
+import pygame
+import struct
+import sys
+import wave
+
+from os.path import abspath, dirname, exists, join, relpath
+
+MAGIC = b"LEMPACK1"
+HEADER = struct.Struct("<8sI")
+ALIGNMENT = 64
+IMAGE_FORMAT = "BGRA"
+
+
+class Asset_pack(object):
+    def __init__(self, path):
+        self.path = path
+        self.root = dirname(abspath(path))
+        self.file = open(path, "rb")
+
+        # Copy-on-write mapping: drawing onto a packed surface only gives it
+        # private pages, the pack file is never modified
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.view = memoryview(self.buffer)
+
+        magic, index_size = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError("'%s' is not an asset pack" % path)
+
+        self.index = json.loads(bytes(self.view[HEADER.size:HEADER.size \
+            + index_size]).decode("utf-8"))
+        self.data_offset = align(HEADER.size + index_size)
+
+    def __contains__(self, path):
+        return self.get_entry(path) is not None
+
+    def get_key(self, path):
+        return relpath(abspath(path), self.root).replace(os.sep, "/")
+
+    def get_entry(self, path):
+        key = self.get_key(path)
+        entry = self.index["images"].get(key) or self.index["sounds"].get(key)
+        if entry and is_source_unchanged(path, entry):
+            return entry
+        return None
+
+    def get_data(self, entry):
+        start = self.data_offset + entry["offset"]
+        return self.view[start:start + entry["length"]]
+
+    def get_image(self, path):
+        entry = self.index["images"].get(self.get_key(path))
+        if entry and is_source_unchanged(path, entry):
+            return pygame.image.frombuffer(self.get_data(entry), \
+                entry["size"], IMAGE_FORMAT)
+        return None
+
+    def get_samples(self, path, framerate, nb_channels, sample_width):
+        entry = self.index["sounds"].get(self.get_key(path))
+        if entry and is_source_unchanged(path, entry) \
+        and entry["framerate"] == framerate \
+        and entry["channels"] == nb_channels \
+        and entry["sample_width"] == sample_width:
+            return self.get_data(entry)
+        return None
+
+    def is_valid(self, paths):
+        # Missing sources are never packed, they don't outdate the pack
+        return all(path in self for path in paths if exists(path))
+
+
+def open_asset_pack(path, image_paths, sound_paths):
+    """
+    Open the asset pack at path, building it again first if it is missing or
+    if one of the source files changed. Return None if the pack is unusable.
+    """
+
+    pack = None
+    if exists(path):
+        try:
+            pack = Asset_pack(path)
+        except (OSError, ValueError, KeyError):
+            print("[lemapi] [WARNING] [open_asset_pack] Unable to read '%s'" % \
+                path)
+
+    if pack and pack.is_valid(tuple(image_paths) + tuple(sound_paths)):
+        return pack
+
+    print("[lemapi] [INFO] [open_asset_pack] Asset pack '%s' is outdated, " % \
+        path + "building it")
+    try:
+        build_asset_pack(path, image_paths, sound_paths)
+        return Asset_pack(path)
+    except (OSError, ValueError):
+        print("[lemapi] [WARNING] [open_asset_pack] Unable to build '%s'" % path)
+    return None
+
+
+def build_asset_pack(path, image_paths, sound_paths):
+    root = dirname(abspath(path))
+    index = {"images": {}, "sounds": {}}
+    blobs = []
+    offset = 0
+
+    def add_blob(category, source, data, **infos):
+        nonlocal offset
+        stat = os.stat(source)
+        key = relpath(abspath(source), root).replace(os.sep, "/")
+        index[category][key] = dict(infos, offset=offset, length=len(data), \
+            mtime=stat.st_mtime_ns, bytes=stat.st_size)
+        blobs.append((offset, data))
+        offset = align(offset + len(data))
+
+    for source in image_paths:
+        if exists(source):
+            image = pygame.image.load(source)
+            add_blob("images", source, pygame.image.tostring(image, \
+                IMAGE_FORMAT), size=image.get_size())
+
+    for source in sound_paths:
+        if exists(source):
+            with wave.open(source, "rb") as wf:
+                add_blob("sounds", source, wf.readframes(wf.getnframes() - 1), \
+                    framerate=wf.getframerate(), channels=wf.getnchannels(), \
+                    sample_width=wf.getsampwidth())
+
+    index = json.dumps(index).encode("utf-8")
+    data_offset = align(HEADER.size + len(index))
+
+    # Written aside then renamed, so that a running system never maps a
+    # partially written pack
+    with open(path + ".tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(index)))
+        file.write(index)
+        for blob_offset, data in blobs:
+            file.seek(data_offset + blob_offset)
+            file.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def get_pack_sources(data_path):
+    """
+    Return the image and sound paths listed by the resources.json files of a
+    data folder.
+    """
+
+    images = join(data_path, "images")
+    sounds = join(data_path, "audio", "sounds")
+    return ([join(images, *resource) for resource in read_json(join(images, \
+        "resources.json")) or ()], [join(sounds, *resource) for resource in \
+        read_json(join(sounds, "resources.json")) or ()])
+
+
+def is_source_unchanged(path, entry):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_mtime_ns == entry["mtime"] and stat.st_size == entry["bytes"]
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+if __name__ == "__main__":
+    data_path = sys.argv[1] if len(sys.argv) > 1 else \
+        join(dirname(dirname(abspath(__file__))), "data")
+    build_asset_pack(join(data_path, "assets.pack"), \
+        *get_pack_sources(data_path))
@@ -45,6 +45,7 @@ class Player(object):
 
 		self.mixers = []
 		self.sounds = {}
+		self.asset_pack = None
 
 	def load_sound(self, path):
 		snd = Sound(self)
@@ -58,6 +59,10 @@ class Player(object):
 		if msc.load(path):
 			print("[lemapi] [INFO] [Player.load_music] Sound '%s' loaded" % path)
 
+	def add_sounds(self, sounds):
+		# Sounds and musics loaded aside, like by a background job
+		self.sounds.update(sounds)
+
 	def get_sound(self, path):
 		snd = Sound(self)
 		if path in self.sounds:
@@ -228,7 +233,10 @@ class Sound(object):
 	def reset(self):
 		self.pos = 0
 
-	def load(self, path):
+	def load(self, path, pack=None):
+		if self.load_packed(path, pack):
+			return True
+
 		if exists(path):
 			try:
 				with wave.open(path, "rb") as wf:
@@ -254,6 +262,19 @@ class Sound(object):
 			print('[lemapi] [WARNING] [Sound.load] Unable to find "%s"' % path)
 		return False
 
+	def load_packed(self, path, pack=None):
+		pack = pack or self.player.asset_pack
+		if pack:
+			samples = pack.get_samples(path, self.player.framerate, \
+				self.player.nb_channels, self.player.sample_width)
+
+			if samples is not None:
+				self.samples = samples
+				self.path = path
+				self.loaded = True
+				return True
+		return False
+
 	def unload(self):
 		if self.loaded:
 			self.samples = bytes()
@@ -281,7 +302,7 @@ class Sound(object):
 				* self.player.nb_channels \
 				* self.player.sample_width
 
-			chunk = self.samples[sample_pos:sample_pos+chunk_size]
+			chunk = bytes(self.samples[sample_pos:sample_pos+chunk_size])
 			self.pos += self.player.chunk_size
 
 			return chunk + bytes(chunk_size - len(chunk))
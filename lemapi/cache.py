@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides shared LRU caches for surfaces which are expensive to build, like
+rendered texts, stretched or rotated images.
+
+Created on 18/10/2026
+"""
+
+from lemapi.constants import App
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import collections
+import pygame
+import threading
+import weakref
+import zlib
+
+
+class Surface_cache(object):
+    def __init__(self, name, budget):
+        self.name = name
+        self.budget = budget
+        self.entries = collections.OrderedDict()
+        self.lock = threading.RLock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+        return None
+
+    def put(self, key, value, nbytes):
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+
+            # The last added entry is always kept, even if bigger than budget
+            while self.entries and self.size + nbytes > self.budget:
+                self.size -= self.entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+            self.entries[key] = (value, nbytes)
+            self.size += nbytes
+
+    def get_or_create(self, key, fct, *args, **kwargs):
+        value = self.get(key)
+        if value is None:
+            value = fct(*args, **kwargs)
+            self.put(key, value, get_bytesize(value))
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "budget": self.budget
+        }
+
+
+def get_surface_key(surface):
+    """
+    Return a key identifying the content of a surface, so that equal images
+    loaded or converted several times share the same cache entries.
+    """
+
+    try:
+        digest = surface_digests[surface]
+    except KeyError:
+        digest = (surface.get_size(), zlib.crc32(pygame.image.tostring( \
+            surface, "RGBA")))
+        surface_digests[surface] = digest
+    return (digest, surface.get_alpha(), surface.get_colorkey())
+
+
+def get_bytesize(value):
+    """
+    Return the memory used by the pixels of a surface, or by all the surfaces
+    found in a tuple or a list.
+    """
+
+    if isinstance(value, (tuple, list)):
+        return sum(get_bytesize(item) for item in value)
+    if hasattr(value, "get_pitch"):
+        return value.get_pitch() * value.get_height()
+    return 0
+
+
+surface_digests = weakref.WeakKeyDictionary()
+text_cache = Surface_cache("text", App.TEXT_CACHE_BUDGET)
+stretch_cache = Surface_cache("stretch", App.STRETCH_CACHE_BUDGET)
+rotation_cache = Surface_cache("rotation", App.ROTATION_CACHE_BUDGET)
+spinner_cache = Surface_cache("spinner", App.SPINNER_CACHE_BUDGET)
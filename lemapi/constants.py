@@ -10,6 +10,13 @@ from os.path import join, dirname, abspath
 class App(object):
     NAME = "LemAPI"
     GPIO_ENABLE = False
+    COALESCE_MOUSE_MOTION = True
+    GPIO_SAMPLE_RATE = 250
+    GPIO_EDGE_CALLBACKS = False
+    JOYSTICK_CHANGE_THRESHOLD = 0.02
+    JOYSTICK_DIRECTION_THRESHOLDS = (0.5, 0.3)
+    JOYSTICK_AVERAGE_SIZE = 8
+    JOYSTICK_ONE_EURO_PARAMS = (1.0, 2.0, 1.0)
     RPI_ENV = False
     SCREEN_SIZE = (800, 480)
     SPLASH_ANIMATION = True
@@ -19,10 +26,54 @@ class App(object):
         "theme_color": "white",
         "username": "LemAPI user",
         "custom_date": (0, 0, 0),
-        "custom_time": (0, 0)
+        "custom_time": (0, 0),
+        "control_joystick_deadzone": 0.1,
+        "control_joystick_filter": "one_euro",
+        "control_joystick_calibration": {
+            "center": [0.5, 0.5],
+            "min": [0, 0],
+            "max": [1, 1]
+        }
     }
     DEFAULT_APPS = ("Pyoro", "Robot", "Settings")
     THEME_COLORS = ("white", "blue", "green", "red", "magenta", "orange", "cyan", "yellow")
+    COMPOSITOR_ENABLE = True
+    COMPOSITOR_COVERAGE_THRESHOLD = 0.75
+    # Checksums the pushed regions, costly: only for views redrawing whole
+    # regions unchanged
+    COMPOSITOR_SKIP_UNCHANGED = False
+    TEXT_CACHE_BUDGET = 2 * 1024 * 1024
+    STRETCH_CACHE_BUDGET = 8 * 1024 * 1024
+    ROTATION_CACHE_BUDGET = 32 * 1024 * 1024
+    ROTATION_STEP = 2
+    # Large round spinners (like the splash labyrinth) are rotated at a
+    # coarser step, so that a full turn fits in their own cache: 6° frames
+    # make them move by steps of 1 to 2 frames at their speed, and a turn of
+    # the three splash rings takes about 60 MB
+    SPINNER_CACHE_BUDGET = 64 * 1024 * 1024
+    SPINNER_ROTATION_STEP = 6
+    LAZY_IMAGE_LOADING = True
+    IMAGE_LOADER_WORKERS = 0
+    ASSET_PACK_ENABLE = True
+    SPATIAL_GRID_CELL_SIZE = 64
+    JOB_WORKERS = 2
+    JOB_PROCESSES = 0
+    JOB_QUEUE_SIZE = 64
+    LOOP_MODE = "variable"
+    LOOP_FIXED_STEP = 1 / 60
+    LOOP_MAX_STEPS = 5
+    LOOP_MAX_FPS = 60
+    LOOP_SPIN_TIME = 0.002
+    IDLE_ENABLE = True
+    IDLE_MAX_WAIT = 0.5
+    PROFILER_FRAMES = 300
+    PROFILER_TOP_WIDGETS = 5
+    PROFILER_OVERLAY_PERIOD = 0.25
+    PROFILER_OVERLAY_POS = (0, 0)
+    PROFILER_OVERLAY_SIZE = (260, 150)
+    LATENCY_TRACE = None
+    LATENCY_SUMMARY_FRAMES = 600
+    LATENCY_BUCKETS = (0.001, 0.002, 0.004, 0.008, 0.016, 0.033, 0.05, 0.1, 0.2)
 
 
 class Path(object):
@@ -32,6 +83,7 @@ class Path(object):
     AUDIO = join(DATA, "audio")
     MUSICS = join(AUDIO, "music")
     SOUNDS = join(AUDIO, "sounds")
+    ASSET_PACK = join(DATA, "assets.pack")
     GAMES = join("/", "home", "{user}", "games")
     SAVES = join("/", "home", "{user}", "saves")
 
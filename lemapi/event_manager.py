@@ -1,219 +1,448 @@
 # -*- coding: utf-8 -*-
 
-from lemapi.api import get_view
+from lemapi.api import get_control_sampler
 from lemapi.constants import GPIO, App
+from lemapi.input_filter import Joystick_conditioner
+from lemapi.system_instance import Instance
 from lemapi.util import exit
 
 __author__ = "Julien Dubois"
 __version__ = "0.1.0"
 
+import collections
 import gpiozero
 import pygame
+import threading
+import time
 from pygame.locals import QUIT, KEYDOWN, KEYUP, JOYBUTTONDOWN, JOYBUTTONUP, \
-    JOYAXISMOTION, K_RIGHT, K_LEFT, K_UP, K_DOWN
+    JOYAXISMOTION, MOUSEMOTION, NOEVENT, K_RIGHT, K_LEFT, K_UP, K_DOWN
+
+# Bit of each keycode in the pressed keys bitsets, given on first use
+KEY_BITS = {}
+CONTROL_BUTTON_EVENT = pygame.event.custom_type()
+# Posted by the Control_sampler to wake up an idle main loop, never dispatched
+CONTROL_WAKE_EVENT = pygame.event.custom_type()
+JOYSTICK_TYPES = (JOYAXISMOTION, (JOYAXISMOTION, K_RIGHT), \
+    (JOYAXISMOTION, K_LEFT), (JOYAXISMOTION, K_UP), (JOYAXISMOTION, K_DOWN), \
+    (JOYAXISMOTION, KEYUP))
+
+
+Control_state = collections.namedtuple("Control_state", ("timestamp", "joy_x", \
+    "joy_y", "buttons"))
+
+
+class Event_bus(object):
+    """
+    Pump the SDL event queue once per frame and dispatch its events in order
+    to the view of the current activity, then update the global and the
+    current activity listener managers.
+
+    Events are stamped with the time of the pump (time.perf_counter()),
+    unless they already carry a timestamp attribute. Consecutive MOUSEMOTION
+    events are merged into the latest one if App.COALESCE_MOUSE_MOTION is
+    enabled.
+
+    wait() blocks until an event arrives, which is kept for the next pump.
+
+    The pumped events, the control state and the deltatime of each frame are
+    written by the recorder (an Input_recorder) if any. With a player (an
+    Input_player), they are read from its log instead of the live inputs.
+    """
+
+    def __init__(self, recorder=None, player=None):
+        self.events = []
+        self.time = 0
+        self.deltatime = 0
+        self.coalesce_motion = App.COALESCE_MOUSE_MOTION
+        self.coalesced_events = 0
+        self.control_state = None
+        self.recorder = recorder
+        self.player = player
+        self.waited_events = []
+
+    def begin_frame(self, deltatime):
+        """
+        Return the deltatime to use for this frame: the given one, or the
+        recorded one when replaying. Stop the system at the end of a replay.
+        """
+
+        if self.player:
+            deltatime = self.player.next_frame()
+            if deltatime is None:
+                self.player.close()
+                exit()
+        self.deltatime = deltatime
+        return deltatime
+
+    def get_events(self):
+        if self.player:
+            # Events posted while replaying (by widgets or by the sampler)
+            # were recorded, they must not be dispatched twice
+            pygame.event.get()
+            return [pygame.event.Event(type, attributes) for type, attributes \
+                in self.player.events]
+
+        events = pygame.event.get()
+        if self.waited_events:
+            events = self.waited_events + events
+            self.waited_events = []
+        if App.GPIO_ENABLE:
+            events = [event for event in events if event.type != \
+                CONTROL_WAKE_EVENT]
+        if self.recorder:
+            self.recorder.add_events(events)
+        return events
+
+    def wait(self, timeout):
+        """
+        Block until an event arrives or for timeout seconds.
+        """
+
+        event = pygame.event.wait(max(int(timeout * 1000), 1))
+        if event.type not in (NOEVENT, CONTROL_WAKE_EVENT):
+            self.waited_events.append(event)
+
+    def get_control_state(self):
+        if self.player:
+            if self.player.control_state is None:
+                return None
+            x, y, buttons = self.player.control_state
+            return Control_state(self.time, x, y, frozenset(buttons))
+        if App.GPIO_ENABLE:
+            return get_control_sampler().state
+        return None
+
+    def pump(self):
+        # The same buffer is reused every frame
+        events = self.events
+        events.clear()
+
+        for event in self.get_events():
+            if self.coalesce_motion and event.type == MOUSEMOTION and events \
+            and events[-1].type == MOUSEMOTION:
+                events[-1] = merge_motion_events(events[-1], event)
+                self.coalesced_events += 1
+            else:
+                events.append(event)
+
+        self.time = time.perf_counter()
+        return events
+
+    def update(self):
+        for event in self.pump():
+            if event.type == QUIT:
+                exit()
+            self.dispatch(event)
+
+        # Read once, so that every listener manager sees the same state
+        self.control_state = self.get_control_state()
+        tracer = Instance.latency_tracer
+        if tracer and self.control_state:
+            tracer.begin_input(JOYAXISMOTION, self.control_state.timestamp)
+
+        for listener_manager in self.get_listener_managers():
+            listener_manager.update(self.control_state)
+
+        if tracer:
+            tracer.end_input()
+
+        if self.recorder:
+            self.recorder.write_frame(self.deltatime, self.control_state)
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def dispatch(self, event):
+        timestamp = getattr(event, "timestamp", self.time)
+        tracer = Instance.latency_tracer
+        if tracer:
+            tracer.begin_input(event.type, timestamp)
+
+        # Looked up for each event, as an event can start or stop an activity
+        for listener_manager in self.get_listener_managers():
+            listener_manager.on_event(event, timestamp)
+
+        if Instance.activities:
+            activity = Instance.activities[-1]
+            if activity.listener_manager.enable:
+                activity.view.updateEvent(event)
+
+        if tracer:
+            tracer.end_input()
+
+    def get_listener_managers(self):
+        listener_managers = []
+        if Instance.listener_manager:
+            listener_managers.append(Instance.listener_manager)
+        if Instance.activities:
+            listener_managers.append(Instance.activities[-1].listener_manager)
+        return listener_managers
 
 
 class Listener_manager(object):
     def __init__(self):
-        self.listeners = []
+        # Listeners are indexed by type, and by type and key (or button), so
+        # that only the ones concerned by a change are evaluated
+        self.listeners = {}
+        self.key_listeners = {}
         self.enable = True
         self.km = Keyboard_manager(self)
         self.cm = Control_manager(self)
 
     def add_listener(self, event, type, *values):
-        self.listeners.append((event, type, values))
+        listener = (event, type, values)
+        self.listeners.setdefault(type, []).append(listener)
+        for value in values:
+            self.key_listeners.setdefault((type, value), []).append(listener)
+        return listener
+
+    def remove_listener(self, listener):
+        event, type, values = listener
+        lists = [self.listeners.get(type)]
+        lists.extend(self.key_listeners.get((type, value)) for value in values)
+
+        for listeners in lists:
+            if listeners and listener in listeners:
+                listeners.remove(listener)
+
+    def get_listeners(self, types, keys=None):
+        """
+        Return the listeners of the given types, or only the ones listening
+        at least one of keys if keys is not None.
+        """
+
+        listeners = {}
+        for type in types:
+            if keys is None:
+                for listener in self.listeners.get(type, ()):
+                    listeners[id(listener)] = listener
+            else:
+                for key in keys:
+                    for listener in self.key_listeners.get((type, key), ()):
+                        listeners[id(listener)] = listener
+        return tuple(listeners.values())
 
     def clear(self):
         self.listeners.clear()
+        self.key_listeners.clear()
 
-    def update(self):
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                exit()
-            if self.enable:
-                get_view().updateEvent(event)
+    def on_event(self, event, timestamp):
+        # Key and button states are tracked even when disabled, to stay in sync
+        self.km.on_event(event, timestamp)
+        self.cm.on_event(event, timestamp)
 
-        if self.enable:
-            self.km.update()
-            self.cm.update()
+    def update(self, control_state=None):
+        if self.enable and control_state:
+            self.cm.update(control_state)
 
 
 class Keyboard_manager(object):
+    """
+    Track the pressed keys from KEYDOWN and KEYUP events in a bitset and call
+    key combo listeners on transitions only: a KEYDOWN combo when its last
+    key is pressed, a KEYUP combo when its last key is released.
+    """
+
     def __init__(self, listener_manager):
         self.lm = listener_manager
-        self.current_states = []
+        self.pressed = 0
+        self.key_times = {}
+        self.timestamp = 0
 
     def add_key_down_event(self, event, key, *modifiers, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, KEYDOWN, key, *modifiers)
+        return self.lm.add_listener(event, KEYDOWN, key, *modifiers)
 
     def add_key_up_event(self, event, key, *modifiers, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, KEYUP, key, *modifiers)
-
-    def update(self):
-        pressed = pygame.key.get_pressed()
-        for event, type, values in self.lm.listeners:
-
-            if type == KEYDOWN:
-                if Keyboard_manager.has_all_key_pressed(values, pressed):
-                    if not event.obsolete:
-                        event.call()
-                else:
-                    event.obsolete = False
-
-            elif type == KEYUP:
-                if Keyboard_manager.has_all_key_released(values, pressed):
-                    if not event.obsolete:
-                        event.call()
-                else:
-                    event.obsolete = False
-
-    @staticmethod
-    def has_all_key_pressed(pressed_keys, all_keys):
-        for key in pressed_keys:
-            if not all_keys[key]:
+        return self.lm.add_listener(event, KEYUP, key, *modifiers)
+
+    def on_event(self, event, timestamp):
+        if event.type not in (KEYDOWN, KEYUP):
+            return
+
+        bit = get_key_bit(event.key)
+        pressed = self.pressed | bit if event.type == KEYDOWN else \
+            self.pressed & ~bit
+
+        # Repeated KEYDOWN events are not transitions
+        if pressed == self.pressed:
+            return
+
+        self.pressed = pressed
+        self.key_times[event.key] = timestamp
+        self.timestamp = timestamp
+
+        if self.lm.enable:
+            for listener in self.lm.get_listeners((event.type,), (event.key,)):
+                listener_event, type, values = listener
+                if type == KEYDOWN and self.has_all_key_pressed(values):
+                    listener_event.call()
+                elif type == KEYUP and self.has_all_key_released(values):
+                    listener_event.call()
+
+    def sync(self, keyboard_manager):
+        self.pressed = keyboard_manager.pressed
+        self.key_times.update(keyboard_manager.key_times)
+
+    def is_pressed(self, key):
+        return bool(self.pressed & get_key_bit(key))
+
+    def get_key_time(self, key):
+        """
+        Return the time (time.perf_counter()) of the last press or release
+        of key, or None if it did not change yet.
+        """
+
+        return self.key_times.get(key)
+
+    def has_all_key_pressed(self, keys):
+        for key in keys:
+            if not self.pressed & get_key_bit(key):
                 return False
         return True
 
-    @staticmethod
-    def has_all_key_released(released_keys, all_keys):
-        for key in released_keys:
-            if all_keys[key]:
+    def has_all_key_released(self, keys):
+        for key in keys:
+            if self.pressed & get_key_bit(key):
                 return False
         return True
 
 
 class Control_manager(object):
+    """
+    Call the listeners of the buttons and of the joystick. Button changes are
+    received as CONTROL_BUTTON_EVENT events from the event bus, the joystick
+    position is read from the control state given by the event bus (the one
+    published by the Control_sampler, or a replayed one).
+    """
+
     def __init__(self, listener_manager):
         self.lm = listener_manager
-
-        if App.GPIO_ENABLE:
-            self.joystick = {
-                "joy_x": gpiozero.MCP3008(GPIO.JOY_X),
-                "joy_y": gpiozero.MCP3008(GPIO.JOY_Y),
-            }
-
-            self.buttons = {
-                "button_joy": gpiozero.Button(GPIO.JOY_BUTTON),
-                "button_a": gpiozero.Button(GPIO.BUTTON_A),
-                "button_b": gpiozero.Button(GPIO.BUTTON_B),
-                "button_x": gpiozero.Button(GPIO.BUTTON_X),
-                "button_y": gpiozero.Button(GPIO.BUTTON_Y)
-            }
-
-            self.current_states = {
-                "joy_x": 0,
-                "joy_y": 0,
-            }
-        else:
-            self.joystick = {}
-            self.buttons = {}
-            self.current_states = {}
+        self.pressed_buttons = set()
+        self.current_states = {
+            "joy_x": 0,
+            "joy_y": 0
+        }
+        self.directions = (0, 0)
 
     def add_button_pressed_event(self, event, button, *modifiers, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, JOYBUTTONDOWN, button, *modifiers)
+        return self.lm.add_listener(event, JOYBUTTONDOWN, button, *modifiers)
 
     def add_button_released_event(self, event, button, *modifiers, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, JOYBUTTONUP, button, *modifiers)
+        return self.lm.add_listener(event, JOYBUTTONUP, button, *modifiers)
 
     def add_joy_motion_event(self, event, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, JOYAXISMOTION)
+        return self.lm.add_listener(event, JOYAXISMOTION)
 
     def add_joy_dead_event(self, event, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, (JOYAXISMOTION, KEYUP))
+        return self.lm.add_listener(event, (JOYAXISMOTION, KEYUP))
 
     # Direction changes
     def add_joy_right_event(self, event, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, (JOYAXISMOTION, K_RIGHT))
+        return self.lm.add_listener(event, (JOYAXISMOTION, K_RIGHT))
 
     def add_joy_left_event(self, event, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, (JOYAXISMOTION, K_LEFT))
+        return self.lm.add_listener(event, (JOYAXISMOTION, K_LEFT))
 
     def add_joy_up_event(self, event, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, (JOYAXISMOTION, K_UP))
+        return self.lm.add_listener(event, (JOYAXISMOTION, K_UP))
 
     def add_joy_down_event(self, event, copy=True):
         if copy:
             event = event.get_copy()
-        self.lm.add_listener(event, (JOYAXISMOTION, K_DOWN))
+        return self.lm.add_listener(event, (JOYAXISMOTION, K_DOWN))
 
-    def update(self):
-        if App.GPIO_ENABLE:
-            pressed = self.get_pressed_buttons()
+    def on_event(self, event, timestamp):
+        if event.type != CONTROL_BUTTON_EVENT:
+            return
+
+        if event.pressed == (event.button in self.pressed_buttons):
+            return
 
-            x = -self.joystick["joy_x"].value * 2 - 1
-            y = -self.joystick["joy_y"].value * 2 - 1
+        if event.pressed:
+            self.pressed_buttons.add(event.button)
+            type = JOYBUTTONDOWN
+        else:
+            self.pressed_buttons.discard(event.button)
+            type = JOYBUTTONUP
+
+        if self.lm.enable:
+            for listener in self.lm.get_listeners((type,), (event.button,)):
+                listener_event, type, values = listener
+                if type == JOYBUTTONDOWN and Control_manager \
+                .has_all_button_pressed(self.pressed_buttons, values):
+                    listener_event.call()
+                elif type == JOYBUTTONUP and Control_manager \
+                .has_all_button_released(self.pressed_buttons, values):
+                    listener_event.call()
+
+    def sync(self, control_manager):
+        self.pressed_buttons = set(control_manager.pressed_buttons)
+
+    def update(self, state):
+        if state:
+            x, y = state.joy_x, state.joy_y
             old_x = self.current_states["joy_x"]
             old_y = self.current_states["joy_y"]
-            dz = App.settings.get("control_joystick_deadzone", 0.1)
 
-            for event, type, values in self.lm.listeners:
+            # The sampler only publishes filtered positions which moved by more
+            # than App.JOYSTICK_CHANGE_THRESHOLD
+            if x == old_x and y == old_y:
+                return
 
-                if type == JOYAXISMOTION:
-                    if x != old_x or y != old_y:
-                        event.call(x, y, old_x, old_y)
+            self.current_states["joy_x"] = x
+            self.current_states["joy_y"] = y
+            old_directions = self.directions
+            self.directions = (get_direction(x, old_directions[0]), \
+                get_direction(y, old_directions[1]))
+            direction_x, direction_y = self.directions
 
-                elif type == JOYBUTTONDOWN:
-                    if Control_manager.has_all_button_pressed(pressed, values):
-                        if not event.obsolete:
-                            event.call()
-                    else:
-                        event.obsolete = False
+            for event, type, values in self.lm.get_listeners(JOYSTICK_TYPES):
 
-                elif type == JOYBUTTONUP:
-                    if Control_manager.has_all_button_released(pressed, values):
-                        if not event.obsolete:
-                            event.call()
-                    else:
-                        event.obsolete = False
+                if type == JOYAXISMOTION:
+                    event.call(x, y, old_x, old_y)
 
                 elif type == (JOYAXISMOTION, K_RIGHT):
                     if abs(x) >= abs(y):
-                        if x >= dz and old_x < dz:
+                        if direction_x == 1 and old_directions[0] != 1:
                             event.call()
                 elif type == (JOYAXISMOTION, K_LEFT):
                     if abs(x) >= abs(y):
-                        if x <= -dz and old_x > -dz:
+                        if direction_x == -1 and old_directions[0] != -1:
                             event.call()
                 elif type == (JOYAXISMOTION, K_UP):
                     if abs(x) < abs(y):
-                        if y >= dz and old_y < dz:
+                        if direction_y == 1 and old_directions[1] != 1:
                             event.call()
                 elif type == (JOYAXISMOTION, K_DOWN):
                     if abs(x) < abs(y):
-                        if y <= -dz and old_y > -dz:
+                        if direction_y == -1 and old_directions[1] != -1:
                             event.call()
                 elif type == (JOYAXISMOTION, KEYUP):
-                    if x < dz and x > -dz and (old_x >= dz or old_x <= -dz):
-                        if y < dz and y > -dz:
-                            event.call()
-                    elif y < dz and y > -dz and (old_y >= dz or old_y <= dz):
-                        if x < dz and x > -dz:
-                            event.call()
-
-            for name in ("joy_x", "joy_y"):
-                self.current_states[name] = -self.joystick[name].value * 2 - 1
+                    if self.directions == (0, 0) and old_directions != (0, 0):
+                        event.call()
 
     def get_pressed_buttons(self):
-        return [name for name, button in self.buttons.items() if \
-            button.is_pressed]
+        return list(self.pressed_buttons)
 
     @staticmethod
     def has_all_button_pressed(seq, subseq):
@@ -230,6 +459,174 @@ class Control_manager(object):
         return True
 
 
+class Control_sampler(object):
+    """
+    Sample the joystick ADC and the buttons on a background thread at
+    App.GPIO_SAMPLE_RATE Hz, so that the main loop never waits for SPI reads.
+
+    Each sample is published as a new Control_state which replaces the
+    previous one as a whole, so the main loop reads a consistent snapshot
+    without lock. Button changes are posted as CONTROL_BUTTON_EVENT events,
+    timestamped when sampled, or when the hardware edge is seen if
+    App.GPIO_EDGE_CALLBACKS is enabled.
+
+    Devices use the given gpiozero pin factory, or the default one (which
+    can be set with GPIOZERO_PIN_FACTORY=mock to run without a Raspberry Pi).
+    """
+
+    def __init__(self, rate=None, edge_callbacks=None, pin_factory=None):
+        self.period = 1 / (rate or App.GPIO_SAMPLE_RATE)
+        self.edge_callbacks = App.GPIO_EDGE_CALLBACKS if edge_callbacks is \
+            None else edge_callbacks
+        self.thread = None
+        self.active = False
+        self.samples = 0
+
+        self.joystick = {
+            "joy_x": gpiozero.MCP3008(GPIO.JOY_X, pin_factory=pin_factory),
+            "joy_y": gpiozero.MCP3008(GPIO.JOY_Y, pin_factory=pin_factory)
+        }
+
+        self.buttons = {
+            "button_joy": gpiozero.Button(GPIO.JOY_BUTTON, \
+                pin_factory=pin_factory),
+            "button_a": gpiozero.Button(GPIO.BUTTON_A, pin_factory=pin_factory),
+            "button_b": gpiozero.Button(GPIO.BUTTON_B, pin_factory=pin_factory),
+            "button_x": gpiozero.Button(GPIO.BUTTON_X, pin_factory=pin_factory),
+            "button_y": gpiozero.Button(GPIO.BUTTON_Y, pin_factory=pin_factory)
+        }
+
+        self.pressed = {name: False for name in self.buttons}
+        self.state = Control_state(0, 0, 0, frozenset())
+        self.conditioner = Joystick_conditioner()
+        self.raw = (0.5, 0.5)
+        self.calibration = None
+
+        if self.edge_callbacks:
+            for name, button in self.buttons.items():
+                button.when_pressed = self.get_edge_callback(name, True)
+                button.when_released = self.get_edge_callback(name, False)
+
+    def get_edge_callback(self, name, pressed):
+        return lambda: self.set_button(name, pressed, time.perf_counter())
+
+    def set_button(self, name, pressed, timestamp):
+        if self.pressed[name] != pressed:
+            self.pressed[name] = pressed
+            pygame.event.post(pygame.event.Event(CONTROL_BUTTON_EVENT, \
+                button=name, pressed=pressed, timestamp=timestamp))
+
+    def sample(self):
+        timestamp = time.perf_counter()
+
+        if not self.edge_callbacks:
+            for name, button in self.buttons.items():
+                self.set_button(name, button.is_pressed, timestamp)
+
+        self.raw = (self.joystick["joy_x"].value, self.joystick["joy_y"].value)
+        if self.calibration:
+            self.update_calibration()
+
+        position = self.conditioner.process(*self.raw, timestamp)
+        x, y = position or (self.state.joy_x, self.state.joy_y)
+        self.state = Control_state(timestamp, x, y, frozenset(name for name, \
+            pressed in self.pressed.items() if pressed))
+        self.samples += 1
+
+        # Joystick motions are not events, an idle main loop must be woken up
+        if position and Instance.main_loop and Instance.main_loop.idle:
+            pygame.event.post(pygame.event.Event(CONTROL_WAKE_EVENT))
+
+    def start_calibration(self):
+        """
+        Start to calibrate the joystick, which must be at rest. Its extreme
+        positions are recorded until stop_calibration() is called.
+        """
+
+        self.calibration = {
+            "center": list(self.raw),
+            "min": list(self.raw),
+            "max": list(self.raw)
+        }
+
+    def update_calibration(self):
+        minimums, maximums = self.calibration["min"], self.calibration["max"]
+        for axis, raw in enumerate(self.raw):
+            minimums[axis] = min(minimums[axis], raw)
+            maximums[axis] = max(maximums[axis], raw)
+
+    def stop_calibration(self):
+        # Stored in the settings, which are saved with the others
+        calibration, self.calibration = self.calibration, None
+        if calibration:
+            Instance.settings["control_joystick_calibration"] = calibration
+        return calibration
+
+    def start(self):
+        if not self.active:
+            self.active = True
+            self.thread = threading.Thread(target=self.loop, daemon=True)
+            self.thread.start()
+            print("[lemapi] [INFO] [Control_sampler.start] Sampling controls " \
+                + "at %s Hz" % round(1 / self.period))
+
+    def loop(self):
+        next_time = time.perf_counter()
+
+        while self.active:
+            self.sample()
+            next_time += self.period
+            delay = next_time - time.perf_counter()
+
+            # Late samples are not caught up
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.perf_counter()
+
+    def stop(self):
+        if self.active:
+            self.active = False
+            self.thread.join()
+
+        for device in tuple(self.joystick.values()) + tuple(self.buttons.values()):
+            device.close()
+
+
+def merge_motion_events(event, next_event):
+    # The relative motion of both events is kept
+    x, y = getattr(event, "rel", (0, 0))
+    nx, ny = getattr(next_event, "rel", (0, 0))
+    return pygame.event.Event(MOUSEMOTION, next_event.dict, rel=(x + nx, y + ny))
+
+
+def get_direction(value, direction):
+    """
+    Return the direction (-1, 0 or 1) of a joystick axis with hysteresis: it
+    is entered past the first of App.JOYSTICK_DIRECTION_THRESHOLDS and left
+    under the second one.
+    """
+
+    enter, leave = App.JOYSTICK_DIRECTION_THRESHOLDS
+    if direction and value * direction >= leave:
+        return direction
+    if value >= enter:
+        return 1
+    if value <= -enter:
+        return -1
+    return 0
+
+
+def get_key_bit(key):
+    # Keycodes go up to 2^30 + 511 (scancodes flagged with
+    # SDLK_SCANCODE_MASK), bits are given in order of use so that bitsets
+    # stay small without folding keycodes onto each other
+    bit = KEY_BITS.get(key)
+    if bit is None:
+        bit = KEY_BITS[key] = 1 << len(KEY_BITS)
+    return bit
+
+
 class Event(object):
     def __init__(self, fct, *args, **kwargs):
         self.fct = fct
@@ -242,7 +639,13 @@ class Event(object):
         self.obsolete = True
 
         if self.enable:
-            self.fct(*nargs, *self.args, **nkwargs, **self.kwargs)
+            tracer = Instance.latency_tracer
+            if tracer and tracer.input:
+                start = time.perf_counter()
+                self.fct(*nargs, *self.args, **nkwargs, **self.kwargs)
+                tracer.add_callback(self.fct, time.perf_counter() - start)
+            else:
+                self.fct(*nargs, *self.args, **nkwargs, **self.kwargs)
 
     def get_copy(self):
         return Event(self.fct, *self.args, **self.kwargs)
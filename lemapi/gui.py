@@ -3,65 +3,234 @@
 from lemapi.api import get_theme_color
 from lemapi.constants import App, Path
 from lemapi.util import read_json
+from lemapi.system_instance import Instance
 
 __author__ = "Julien Dubois"
 __version__ = "0.1.0"
 
+import concurrent.futures
 import os
 import pygame
+import threading
+import time
+import zlib
 
 
 class GUI(object):
     def __init__(self):
+        # Images are converted to the display format once the display exists
+        # and are then shared between all the callers of get_image
         self.images = {}
+        self.opaque_images = {}
+        self.converted_images = set()
+        self.lazy_loading = App.LAZY_IMAGE_LOADING
+        self.lock = threading.RLock()
+        self.asset_pack = None
+        self.alpha_masks = None
         self.root_surface = None
         self.updated_rect = []
+        self.clip_rect = None
+
+        # Compositor
+        self.compositor = App.COMPOSITOR_ENABLE
+        self.coverage_threshold = App.COMPOSITOR_COVERAGE_THRESHOLD
+        self.skip_unchanged = App.COMPOSITOR_SKIP_UNCHANGED
+        self.region_checksums = {}
+        self.rects_submitted = 0
+        self.rects_pushed = 0
+        # Whether the last update had anything drawn, for the idle mode
+        self.drawn = False
 
     def create_root_surface(self):
         print("[lemapi] [INFO] [GUI.create_root_surface] Creating display " \
             + "surface (800x480 manual)")
         self.root_surface = pygame.display.set_mode(App.SCREEN_SIZE)#, pygame.FULLSCREEN)
         pygame.display.set_caption(App.NAME)
+        self.alpha_masks = pygame.Surface((1, 1), pygame.SRCALPHA) \
+            .convert_alpha().get_masks()
+        self.convert_images()
 
     def load_image(self, path):
         if "{theme_color}" in path:
             path = path.format(theme_color=get_theme_color())
 
-        if os.path.exists(path):
-            try:
-                self.images[path] = pygame.image.load(path)
-                print("[lemapi] [INFO] [GUI.load_image] Image '%s' loaded" % \
-                    path)
-            except Exception:
-                print("[lemapi] [WARNING] [GUI.load_image] Something wrong " \
-                    + "happened while loading '%s'" % path)
-        else:
-            print("[lemapi] [WARNING] [GUI.load_image] Image '%s' not found" % \
+        if self.load_packed_image(path):
+            return
+
+        image = decode_image(path, convert=False)
+        if image:
+            self.add_image(path, image)
+            print("[lemapi] [INFO] [GUI.load_image] Image '%s' loaded" % \
                 path)
 
+    def load_images(self, paths, progress=None):
+        loader = Resource_loader(self)
+        loader.load_images(paths, progress)
+
+    def load_packed_image(self, path):
+        image = self.asset_pack.get_image(path) if self.asset_pack else None
+        if image:
+            # Packed pixels matching the display format are used in place,
+            # converting them would copy them out of the mapped pack
+            self.add_image(path, image, converted=self.is_display_format(image))
+        return image is not None
+
+    def is_display_format(self, surface):
+        return pygame.display.get_surface() is not None \
+            and surface.get_bitsize() == 32 \
+            and surface.get_masks() == self.alpha_masks
+
+    def add_image(self, path, image, converted=False):
+        with self.lock:
+            self.images[path] = image
+            self.opaque_images.pop(path, None)
+
+            if converted:
+                self.converted_images.add(path)
+            else:
+                self.converted_images.discard(path)
+                self.convert_image(path)
+
+    def add_images(self, images):
+        # Images decoded by Resource_loader.decode_images
+        for path, (image, converted) in images.items():
+            self.add_image(path, image, converted)
+
+    def convert_image(self, path):
+        with self.lock:
+            if path not in self.converted_images and pygame.display.get_surface():
+                self.images[path] = self.images[path].convert_alpha()
+                self.converted_images.add(path)
+
+    def convert_images(self):
+        with self.lock:
+            for path in tuple(self.images):
+                self.convert_image(path)
+
     def get_image(self, path, alpha=True):
+        """
+        Return a loaded image. The returned surface is shared with the other
+        callers and must not be modified, use get_writable_image instead.
+        """
+
         if "{theme_color}" in path:
             path = path.format(theme_color=get_theme_color())
-            
-        if path in self.images:
-            if alpha:
-                return self.images[path].convert_alpha()
-            return self.images[path].convert()
+
+        with self.lock:
+            # Images not prefetched (like other themes) are loaded on first use
+            if path not in self.images and self.lazy_loading:
+                self.load_image(path)
+
+            if path in self.images:
+                self.convert_image(path)
+                if alpha:
+                    return self.images[path]
+                if path not in self.opaque_images:
+                    self.opaque_images[path] = self.images[path].convert()
+                return self.opaque_images[path]
         print("[lemapi] [WARNING] [GUI.get_image] Image '%s' not loaded!" % \
             path)
         return pygame.Surface((16, 16))
 
+    def get_writable_image(self, path, alpha=True):
+        """
+        Return a private copy of a loaded image, for widgets changing its
+        pixels, colorkey or alpha.
+        """
+
+        return self.get_image(path, alpha).copy()
+
+    def get_images_bytesize(self):
+        images = list(self.images.values()) + list(self.opaque_images.values())
+        return sum(image.get_pitch() * image.get_height() for image in images)
+
     def get_empty_image(self, size=(16, 16)):
         return pygame.Surface(size, pygame.SRCALPHA)
 
     def update(self):
-        pygame.display.update(self.updated_rect)
+        if self.compositor and self.root_surface:
+            rects = self.compose_rects(self.updated_rect)
+        else:
+            rects = list(self.updated_rect)
+
+        self.rects_submitted += len(self.updated_rect)
+        self.rects_pushed += len(rects)
+        self.drawn = bool(self.updated_rect)
+        if Instance.profiler:
+            Instance.profiler.add_rects(len(self.updated_rect), len(rects))
+
+        if rects:
+            pygame.display.update(rects)
         self.updated_rect.clear()
 
+        if Instance.latency_tracer:
+            Instance.latency_tracer.on_display_update(bool(rects))
+
+    def compose_rects(self, rects):
+        screen = self.root_surface.get_rect()
+        rects = [screen.clip(pygame.Rect(rect)) for rect in rects]
+        rects = merge_rects([rect for rect in rects if rect.w and rect.h])
+
+        area = sum(rect.w * rect.h for rect in rects)
+        if area >= screen.w * screen.h * self.coverage_threshold:
+            rects = [screen]
+
+        if self.skip_unchanged:
+            rects = self.remove_unchanged_rects(rects)
+        return rects
+
+    def remove_unchanged_rects(self, rects):
+        # Only checksums of the previous frame are kept, so a skipped region
+        # is always one whose pixels were last pushed with the same content.
+        # Each region is read back from the display, which costs more than
+        # pushing it unless the display update is slow
+        checksums = {}
+        changed_rects = []
+
+        for rect in rects:
+            key = tuple(rect)
+            content = pygame.image.tostring(self.root_surface.subsurface(rect), \
+                "RGB")
+            checksum = zlib.crc32(content)
+            checksums[key] = checksum
+
+            if self.region_checksums.get(key) != checksum:
+                changed_rects.append(rect)
+
+        self.region_checksums = checksums
+        return changed_rects
+
+    def invalidate_regions(self):
+        self.region_checksums.clear()
+
+    def get_compositor_stats(self):
+        return {
+            "rects_submitted": self.rects_submitted,
+            "rects_pushed": self.rects_pushed
+        }
+
+    def reset_compositor_stats(self):
+        self.rects_submitted = 0
+        self.rects_pushed = 0
+
+    def add_updated_rect(self, rect):
+        if self.clip_rect:
+            rect = self.clip_rect.clip(pygame.Rect(rect))
+        self.updated_rect.append(rect)
+
+    def set_clip(self, rect=None):
+        if rect:
+            self.clip_rect = pygame.Rect(rect)
+        else:
+            self.clip_rect = None
+
+        if self.root_surface:
+            self.root_surface.set_clip(self.clip_rect)
+
     def draw_image(self, image, pos):
         if self.root_surface:
             self.root_surface.blit(image, pos)
-            self.updated_rect.append((pos, image.get_size()))
+            self.add_updated_rect((pos, image.get_size()))
         else:
             print("[lemapi] [WARNING] [GUI.draw_image] Can't draw any image ! No" \
                 + " root surface created yet !")
@@ -70,7 +239,7 @@ class GUI(object):
         if self.root_surface:
             rect = (pos, size)
             self.root_surface.fill(color, rect)
-            self.updated_rect.append(rect)
+            self.add_updated_rect(rect)
         else:
             print("[lemapi] [WARNING] [GUI.draw_color] Can't apply any color ! " \
                 + "No root surface created yet !")
@@ -79,31 +248,23 @@ class GUI(object):
         if self.root_surface:
             rect = ((0, 0), self.get_size())
             self.root_surface.fill(color)
-            self.updated_rect.append(rect)
+            self.add_updated_rect(rect)
         else:
             print("[lemapi] [WARNING] [GUI.draw_background_color] Can't apply " \
                 "any color ! No root surface created yet !")
 
     def draw_polygon(self, color, pos):
         if self.root_surface:
-            x = min(pos, key=lambda p: p[0])[0]
-            y = min(pos, key=lambda p: p[1])[1]
-            w = max(pos, key=lambda p: p[0])[0] - x
-            h = max(pos, key=lambda p: p[1])[1] - y
-            pygame.draw.polygon(self.root_surface, color, pos)
-            self.updated_rect.append(((x, y), (w, h)))
+            rect = pygame.draw.polygon(self.root_surface, color, pos)
+            self.add_updated_rect(rect)
         else:
             print("[lemapi] [WARNING] [GUI.draw_polygon] Can't draw any polygon ! " \
                 + "No root surface created yet !")
 
     def draw_line(self, color, pos1, pos2, width=1):
         if self.root_surface:
-            x = min(pos1[0], pos2[0])
-            y = min(pos1[1], pos2[1])
-            w = max(pos1[0], pos2[0]) - x
-            h = max(pos1[1], pos2[1]) - y
-            pygame.draw.line(self.root_surface, color, pos1, pos2, width)
-            self.updated_rect.append(((x, y), (w, h)))
+            rect = pygame.draw.line(self.root_surface, color, pos1, pos2, width)
+            self.add_updated_rect(rect)
         else:
             print("[lemapi] [WARNING] [GUI.draw_line] Can't draw any line ! " \
                 + "No root surface created yet !")
@@ -116,4 +277,110 @@ class GUI(object):
     def get_current_surface(self):
         if self.root_surface:
             return self.root_surface.copy()
-        return self.get_empty_image(self.get_size())
\ No newline at end of file
+        return self.get_empty_image(self.get_size())
+
+
+class Resource_loader(object):
+    """
+    Decode images on a bounded pool of threads (pygame releases the GIL while
+    decoding) and publish them into the image table of a GUI. Threads not
+    owning the GUI only decode them, their owner publishes them.
+    """
+
+    def __init__(self, gui, workers=None):
+        self.gui = gui
+        self.workers = workers or App.IMAGE_LOADER_WORKERS or os.cpu_count() \
+            or 1
+
+    def load_images(self, paths, progress=None):
+        images = self.decode_images(paths, progress, self.gui.asset_pack)
+        self.gui.add_images(images)
+        return len(images)
+
+    def decode_images(self, paths, progress=None, pack=None):
+        """
+        Decode images (or map them from pack) without publishing them, and
+        return them as a path: (image, converted) dict for GUI.add_images.
+        """
+
+        paths = [path.format(theme_color=get_theme_color()) if \
+            "{theme_color}" in path else path for path in paths]
+        start = time.time()
+        images = {}
+        done = 0
+
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            futures = {}
+
+            # Images found in the asset pack are only mapped, not decoded
+            for path in paths:
+                image = pack.get_image(path) if pack else None
+                if image:
+                    images[path] = (image, self.gui.is_display_format(image))
+                    done += 1
+                else:
+                    futures[pool.submit(decode_image, path)] = path
+            if progress and done:
+                progress(done, len(paths))
+
+            for future in concurrent.futures.as_completed(futures):
+                image = future.result()
+                done += 1
+
+                if image:
+                    images[futures[future]] = (image, \
+                        pygame.display.get_surface() is not None)
+                if progress:
+                    progress(done, len(paths))
+
+        print("[lemapi] [INFO] [Resource_loader.decode_images] %s/%s images " \
+            % (len(images), len(paths)) + "decoded in %.2fs with %s " % \
+            (time.time() - start, self.workers) + "workers")
+        return images
+
+
+def decode_image(path, convert=True):
+    if not os.path.exists(path):
+        print("[lemapi] [WARNING] [decode_image] Image '%s' not found" % path)
+        return None
+
+    try:
+        image = pygame.image.load(path)
+        if convert and pygame.display.get_surface():
+            image = image.convert_alpha()
+        return image
+    except Exception:
+        print("[lemapi] [WARNING] [decode_image] Something wrong happened " \
+            + "while loading '%s'" % path)
+    return None
+
+
+def merge_rects(rects):
+    """
+    Merge overlapping or adjacent rects as long as their union does not cover
+    more pixels than the rects themselves.
+    """
+
+    merged = [pygame.Rect(rect) for rect in rects]
+    changed = True
+
+    while changed:
+        changed = False
+        i = 0
+
+        while i < len(merged):
+            j = i + 1
+            while j < len(merged):
+                a, b = merged[i], merged[j]
+
+                if a.left <= b.right and b.left <= a.right \
+                and a.top <= b.bottom and b.top <= a.bottom:
+                    union = a.union(b)
+                    if union.w * union.h <= a.w * a.h + b.w * b.h:
+                        merged[i] = union
+                        merged.pop(j)
+                        changed = True
+                        continue
+                j += 1
+            i += 1
+    return merged
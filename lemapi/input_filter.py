@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides filters conditioning the joystick samples: calibration, smoothing
+(moving average or one euro filter), radial dead zone and change threshold.
+
+Created on 18/10/2026
+"""
+
+from lemapi.constants import App
+from lemapi.system_instance import Instance
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import collections
+import math
+
+
+class Moving_average_filter(object):
+    def __init__(self, size=None):
+        self.values = collections.deque(maxlen=size or \
+            App.JOYSTICK_AVERAGE_SIZE)
+        self.total = 0
+
+    def filter(self, value, timestamp):
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        return self.total / len(self.values)
+
+
+class One_euro_filter(object):
+    """
+    Low-pass filter whose cutoff frequency rises with the speed of the
+    signal: little jitter at rest, little lag while moving (Casiez et al.).
+    """
+
+    def __init__(self, min_cutoff=None, beta=None, d_cutoff=None):
+        params = App.JOYSTICK_ONE_EURO_PARAMS
+        self.min_cutoff = params[0] if min_cutoff is None else min_cutoff
+        self.beta = params[1] if beta is None else beta
+        self.d_cutoff = params[2] if d_cutoff is None else d_cutoff
+        self.value = None
+        self.derivate = 0
+        self.timestamp = None
+
+    def filter(self, value, timestamp):
+        if self.value is None:
+            self.value = value
+            self.timestamp = timestamp
+            return value
+
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return self.value
+        self.timestamp = timestamp
+
+        alpha = get_smoothing_factor(dt, self.d_cutoff)
+        self.derivate += alpha * ((value - self.value) / dt - self.derivate)
+
+        alpha = get_smoothing_factor(dt, self.min_cutoff + self.beta * \
+            abs(self.derivate))
+        self.value += alpha * (value - self.value)
+        return self.value
+
+
+class No_filter(object):
+    def filter(self, value, timestamp):
+        return value
+
+
+FILTERS = {
+    "none": No_filter,
+    "moving_average": Moving_average_filter,
+    "one_euro": One_euro_filter
+}
+
+
+class Joystick_conditioner(object):
+    """
+    Turn raw ADC samples (0 to 1) into joystick positions (-1 to 1), using
+    the calibration, filter and dead zone of the settings.
+
+    process() only returns a position when it moved by at least
+    App.JOYSTICK_CHANGE_THRESHOLD since the last returned one (or came back
+    to the center), so that noise does not produce motion events.
+    """
+
+    def __init__(self):
+        self.filter_name = None
+        self.filters = ()
+        self.position = (0, 0)
+
+    def get_filters(self, settings):
+        name = settings.get("control_joystick_filter", "one_euro")
+        if name != self.filter_name:
+            filter_class = FILTERS.get(name, No_filter)
+            self.filter_name = name
+            self.filters = (filter_class(), filter_class())
+        return self.filters
+
+    def process(self, raw_x, raw_y, timestamp):
+        settings = Instance.settings or App.DEFAULT_SETTINGS
+        calibration = settings.get("control_joystick_calibration") or \
+            App.DEFAULT_SETTINGS["control_joystick_calibration"]
+        filter_x, filter_y = self.get_filters(settings)
+
+        x = filter_x.filter(normalize(raw_x, calibration, 0), timestamp)
+        y = filter_y.filter(normalize(raw_y, calibration, 1), timestamp)
+        x, y = apply_radial_dead_zone(x, y, settings.get( \
+            "control_joystick_deadzone", 0.1))
+
+        old_x, old_y = self.position
+        threshold = App.JOYSTICK_CHANGE_THRESHOLD
+        if (x, y) == (0, 0) and self.position != (0, 0) \
+        or abs(x - old_x) >= threshold or abs(y - old_y) >= threshold:
+            self.position = (x, y)
+            return self.position
+        return None
+
+
+def normalize(raw, calibration, axis):
+    """
+    Map a raw ADC value to -1 (max) to 1 (min), the center of the
+    calibration giving 0.
+    """
+
+    center = calibration["center"][axis]
+    if raw < center:
+        value = (center - raw) / max(center - calibration["min"][axis], 1e-6)
+    else:
+        value = (center - raw) / max(calibration["max"][axis] - center, 1e-6)
+    return min(max(value, -1), 1)
+
+
+def apply_radial_dead_zone(x, y, dead_zone):
+    # Positions are rescaled so that they start from 0 out of the dead zone
+    radius = math.hypot(x, y)
+    if radius <= dead_zone or dead_zone >= 1:
+        return (0, 0)
+
+    scale = min(1, (radius - dead_zone) / (1 - dead_zone)) / radius
+    return (x * scale, y * scale)
+
+
+def get_smoothing_factor(dt, cutoff):
+    r = 2 * math.pi * cutoff * dt
+    return r / (r + 1)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides a tracer of the input-to-photon latency: the time between the
+arrival of an input event and the display update showing its effects.
+
+Created on 18/10/2026
+"""
+
+from lemapi.constants import App
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import bisect
+import json
+import pygame
+import socket
+import time
+
+
+class Latency_tracer(object):
+    """
+    Trace each input from its dispatch by the event bus, through the
+    Event.call callbacks it triggers, to the display update of its frame.
+
+    Only inputs whose handling damaged the screen (a widget marked dirty or a
+    view region damaged) are traced. If the display update of their frame
+    pushed no pixels, their damage changed nothing and they are only counted
+    as unchanged. Each frame pushing traced inputs is written as a JSON line
+    to the sink, with a summary histogram every App.LATENCY_SUMMARY_FRAMES
+    frames and on close.
+
+    The sink is a file path, or "udp://host:port" to send each line as a
+    datagram to a local socket.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.sink = open_sink(target)
+        self.frame = 0
+        self.input = None
+        self.pending = []
+        self.histogram = [0] * (len(App.LATENCY_BUCKETS) + 1)
+        self.latencies = 0
+        self.unchanged = 0
+
+    def begin_input(self, type, timestamp):
+        self.input = {
+            "type": pygame.event.event_name(type) if isinstance(type, int) \
+                else type,
+            "timestamp": timestamp,
+            "callbacks": [],
+            "damaged": False
+        }
+
+    def end_input(self):
+        if self.input and self.input["damaged"]:
+            self.pending.append(self.input)
+        self.input = None
+
+    def add_callback(self, fct, duration):
+        self.input["callbacks"].append((getattr(fct, "__qualname__", \
+            repr(fct)), duration))
+
+    def on_damage(self):
+        if self.input:
+            self.input["damaged"] = True
+
+    def on_display_update(self, pushed):
+        """
+        Called by the GUI after each display update, pushed being True if
+        pixels were sent to the display.
+        """
+
+        if pushed and self.pending:
+            now = time.perf_counter()
+            inputs = []
+            for input in self.pending:
+                latency = now - input["timestamp"]
+                self.add_latency(latency)
+                inputs.append({
+                    "type": input["type"],
+                    "latency": latency,
+                    "callbacks": input["callbacks"]
+                })
+            self.write({"frame": self.frame, "time": now, "inputs": inputs})
+        else:
+            self.unchanged += len(self.pending)
+
+        self.pending.clear()
+        self.frame += 1
+        if self.frame % App.LATENCY_SUMMARY_FRAMES == 0:
+            self.write_summary()
+
+    def add_latency(self, latency):
+        self.histogram[bisect.bisect_left(App.LATENCY_BUCKETS, latency)] += 1
+        self.latencies += 1
+
+    def get_summary(self):
+        labels = ["<=%gms" % (bucket * 1000) for bucket in App.LATENCY_BUCKETS]
+        labels.append(">%gms" % (App.LATENCY_BUCKETS[-1] * 1000))
+        return {
+            "frame": self.frame,
+            "inputs": self.latencies,
+            "unchanged": self.unchanged,
+            "histogram": dict(zip(labels, self.histogram))
+        }
+
+    def write_summary(self):
+        self.write({"summary": self.get_summary()})
+
+    def write(self, record):
+        try:
+            self.sink.write(json.dumps(record) + "\n")
+        except OSError:
+            # Nobody listening on the socket
+            pass
+
+    def close(self):
+        self.write_summary()
+        self.sink.close()
+        print("[lemapi] [INFO] [Latency_tracer.close] %s inputs traced " % \
+            self.latencies + "to '%s'" % self.target)
+
+
+class Datagram_sink(object):
+    def __init__(self, address):
+        self.address = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def write(self, line):
+        self.socket.sendto(line.encode("utf-8"), self.address)
+
+    def close(self):
+        self.socket.close()
+
+
+def open_sink(target):
+    if target.startswith("udp://"):
+        host, port = target[len("udp://"):].rsplit(":", 1)
+        return Datagram_sink((host, int(port)))
+    return open(target, "a", buffering=1)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides the main loop of the system: input, tasks, activity and display
+updates, paced to a maximal frame rate, with a variable or a fixed
+simulation step, idling while nothing changes.
+
+Created on 18/10/2026
+"""
+
+from lemapi.constants import App
+from lemapi.system_instance import Instance
+from lemapi.util import exit
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import time
+import traceback
+
+PHASES = ("events", "tasks", "activity", "display", "sleep", "idle")
+
+
+class Main_loop(object):
+    """
+    Run the frames of the system until it stops.
+
+    In "variable" mode, the tasks and the activity are updated once per
+    frame with the time elapsed since the previous frame. In "fixed" mode,
+    the elapsed time feeds an accumulator and the tasks are updated by steps
+    of exactly fixed_step seconds (at most App.LOOP_MAX_STEPS per frame, the
+    rest being dropped), so that they behave the same under load. The
+    activity is then updated once with the time simulated by the frame, and
+    alpha (between 0 and 1) gives how far the rendered frame is between the
+    last step and the next one, for views to interpolate their motion.
+
+    Frames are capped to max_fps (0 for no cap) by sleeping, then spinning
+    for the last App.LOOP_SPIN_TIME seconds to wake up on time. Replays are
+    never paced. The time spent in each phase is accumulated in phase_times.
+
+    If App.IDLE_ENABLE, the loop idles after a frame which drew nothing, when
+    no task needs the next update and the activity does not keep the system
+    awake: it blocks until an input arrives, the next delayed task is due or
+    App.IDLE_MAX_WAIT seconds passed. get_duty_cycle() gives the part of the
+    time spent active and idle.
+    """
+
+    def __init__(self, mode=None, fixed_step=None, max_fps=None):
+        self.mode = mode or App.LOOP_MODE
+        if self.mode not in ("variable", "fixed"):
+            raise ValueError("Unknown loop mode '%s'" % self.mode)
+        self.fixed_step = fixed_step or App.LOOP_FIXED_STEP
+        self.max_fps = App.LOOP_MAX_FPS if max_fps is None else max_fps
+        self.accumulator = 0
+        self.alpha = 1
+        self.last_time = None
+        self.next_time = None
+        self.frames = 0
+        self.steps = 0
+        self.phase_times = dict.fromkeys(PHASES, 0)
+        self.idle = False
+        self.idle_waits = 0
+        self.last_idle_time = 0
+        self.start_time = None
+
+    def run(self):
+        self.last_time = time.perf_counter()
+        self.next_time = self.last_time
+        self.start_time = self.last_time
+        while True:
+            self.run_frame()
+
+    def run_frame(self):
+        now = time.perf_counter()
+        profiler = Instance.profiler
+        if profiler:
+            profiler.begin_frame(now)
+        deltatime = Instance.event_bus.begin_frame(now - self.last_time)
+        self.last_time = now
+
+        self.run_phase("events", Instance.event_bus.update, (), \
+            "on an event call", "because of an event call")
+
+        if self.mode == "fixed":
+            deltatime = self.run_steps(deltatime)
+        else:
+            self.run_phase("tasks", Instance.task_manager.update, \
+                (deltatime,), "on a task call", "because of a task call")
+
+        self.run_phase("activity", Instance.activities[-1].update, \
+            (deltatime,), "while updating its current activity", \
+            "while updating the current activity")
+
+        start = time.perf_counter()
+        Instance.gui.update()
+        self.add_phase_time("display", start)
+
+        # The overlay is not part of the display update of the views
+        profiler = Instance.profiler
+        if profiler:
+            profiler.draw_overlay(Instance.gui.root_surface)
+
+        if not Instance.event_bus.player:
+            self.wait_next_frame()
+        self.frames += 1
+
+        if profiler:
+            profiler.end_frame(time.perf_counter())
+
+    def run_steps(self, deltatime):
+        """
+        Update the tasks by fixed steps and return the simulated time.
+        """
+
+        step = self.fixed_step
+        self.accumulator += deltatime
+        steps = 0
+        # The time spent idle is always caught up, no task was polled in it
+        max_steps = App.LOOP_MAX_STEPS + int(self.last_idle_time / step) + 1
+        while self.accumulator >= step and steps < max_steps:
+            self.run_phase("tasks", Instance.task_manager.update, (step,), \
+                "on a task call", "because of a task call")
+            self.accumulator -= step
+            steps += 1
+
+        # Too late to catch up, the simulation slows down instead
+        if self.accumulator >= step:
+            self.accumulator %= step
+        self.alpha = self.accumulator / step
+        self.steps += steps
+        return steps * step
+
+    def run_phase(self, phase, fct, args, app_message, system_message):
+        start = time.perf_counter()
+        try:
+            fct(*args)
+        except Exception:
+            if Instance.app:
+                print("[lemapi] [WARNING] [Main_loop.run_phase] " \
+                    + "'%s' has stopped working " % Instance.app.get_name() \
+                    + "%s!" % app_message)
+                traceback.print_exc()
+            else:
+                print("[lemapi] [FATAL ERROR] [Main_loop.run_phase] LemAPI " \
+                    + "has stopped working %s!" % system_message)
+                traceback.print_exc()
+                exit()
+        self.add_phase_time(phase, start)
+
+    def add_phase_time(self, phase, start):
+        duration = time.perf_counter() - start
+        self.phase_times[phase] += duration
+        if Instance.profiler:
+            Instance.profiler.add_phase(phase, start, duration)
+
+    def wait_next_frame(self):
+        timeout = self.get_idle_timeout()
+        # Idling is only worth it for longer than a frame
+        if timeout is not None and (not self.max_fps \
+        or timeout * self.max_fps > 1):
+            self.wait_input(timeout)
+            return
+
+        self.last_idle_time = 0
+        start = time.perf_counter()
+        if self.max_fps:
+            self.next_time += 1 / self.max_fps
+            remaining = self.next_time - start
+            if remaining > 0:
+                if remaining > App.LOOP_SPIN_TIME:
+                    time.sleep(remaining - App.LOOP_SPIN_TIME)
+                while time.perf_counter() < self.next_time:
+                    pass
+            else:
+                # Late frames are not caught up by shorter ones
+                self.next_time = start
+        self.add_phase_time("sleep", start)
+
+    def get_idle_timeout(self):
+        """
+        Return how long the loop can idle, or None if the next frame is
+        needed.
+        """
+
+        activity = Instance.activities[-1]
+        if not App.IDLE_ENABLE or Instance.gui.drawn \
+        or getattr(activity, "keep_awake", False):
+            return None
+
+        deadline = Instance.task_manager.get_next_deadline()
+        if deadline is None:
+            return App.IDLE_MAX_WAIT
+        if self.mode == "fixed":
+            deadline -= self.accumulator
+        if deadline <= 0:
+            return None
+        return min(deadline, App.IDLE_MAX_WAIT)
+
+    def wait_input(self, timeout):
+        start = time.perf_counter()
+        self.idle = True
+
+        # A joystick motion sampled before idle was set posted no wake event
+        sampler = Instance.control_sampler
+        state = Instance.event_bus.control_state
+        if not (sampler and state and (sampler.state.joy_x, \
+        sampler.state.joy_y) != (state.joy_x, state.joy_y)):
+            Instance.event_bus.wait(timeout)
+
+        self.idle = False
+        self.next_time = time.perf_counter()
+        self.last_idle_time = self.next_time - start
+        self.add_phase_time("idle", start)
+        self.idle_waits += 1
+
+    def get_phase_times(self):
+        """
+        Return the mean time (in seconds) spent per frame in each phase.
+        """
+
+        frames = max(self.frames, 1)
+        return {phase: total / frames for phase, total in \
+            self.phase_times.items()}
+
+    def get_duty_cycle(self):
+        """
+        Return the parts of the time spent active and idle since the start
+        of the loop (or the last reset).
+        """
+
+        total = time.perf_counter() - self.start_time if self.start_time \
+            else 0
+        if total <= 0:
+            return {"active": 1, "idle": 0}
+        idle = min(self.phase_times["idle"] / total, 1)
+        return {"active": 1 - idle, "idle": idle}
+
+    def print_duty_cycle(self):
+        duty_cycle = self.get_duty_cycle()
+        print("[lemapi] [INFO] [Main_loop.print_duty_cycle] Active " \
+            + "%.1f %% of the time, idle %.1f %% " % (duty_cycle["active"] * \
+            100, duty_cycle["idle"] * 100) + "(%s frames, " % self.frames \
+            + "%s idle waits)" % self.idle_waits)
+
+    def reset_phase_times(self):
+        self.phase_times = dict.fromkeys(PHASES, 0)
+        self.frames = 0
+        self.steps = 0
+        self.idle_waits = 0
+        if self.start_time:
+            self.start_time = time.perf_counter()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides a frame profiler: the time spent in each phase of the main loop, in
+the painting of each widget and in each task callback, kept for the last
+frames, shown by an on-screen overlay and exported as a Chrome trace.
+
+Created on 18/10/2026
+"""
+
+from lemapi.constants import App
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import collections
+import json
+import pygame
+import time
+
+# Threads of the Chrome trace
+FRAME_THREAD = 1
+WIDGET_THREAD = 2
+TASK_THREAD = 3
+THREAD_NAMES = {
+    FRAME_THREAD: "Main loop",
+    WIDGET_THREAD: "Widgets",
+    TASK_THREAD: "Tasks"
+}
+
+
+class Frame_record(object):
+    __slots__ = ("start", "end", "phases", "widgets", "tasks", "rects")
+
+    def __init__(self, start):
+        self.start = start
+        self.end = start
+        self.phases = []
+        self.widgets = []
+        self.tasks = []
+        self.rects = (0, 0)
+
+
+class Frame_profiler(object):
+    """
+    Record the timings of the last App.PROFILER_FRAMES frames in a ring
+    buffer. Timings are (name, start, duration) tuples, in seconds of
+    time.perf_counter().
+
+    The overlay (fps, frame times graph and slowest widgets) is drawn over
+    the display after its update and pushed on its own, then the pixels under
+    it are restored, so that it never takes part in the damage of the views.
+    It is rendered again every App.PROFILER_OVERLAY_PERIOD seconds.
+    """
+
+    def __init__(self, trace_path=None, overlay=True):
+        self.frames = collections.deque(maxlen=App.PROFILER_FRAMES)
+        self.frame = None
+        self.trace_path = trace_path
+        self.overlay = overlay
+        self.overlay_surface = None
+        self.overlay_time = 0
+        self.font = None
+        self.listeners = ()
+
+    def begin_frame(self, start):
+        self.frame = Frame_record(start)
+
+    def end_frame(self, end):
+        if self.frame:
+            self.frame.end = end
+            self.frames.append(self.frame)
+            self.frame = None
+
+    def add_phase(self, name, start, duration):
+        if self.frame:
+            self.frame.phases.append((name, start, duration))
+
+    def add_widget(self, name, start, duration):
+        if self.frame:
+            self.frame.widgets.append((name, start, duration))
+
+    def add_task(self, task, start, duration):
+        if self.frame:
+            self.frame.tasks.append((get_task_name(task), start, duration))
+
+    def add_rects(self, submitted, pushed):
+        if self.frame:
+            self.frame.rects = (submitted, pushed)
+
+    def get_frame_times(self):
+        frames = tuple(self.frames)
+        return [frame.start - previous.start for previous, frame in \
+            zip(frames, frames[1:])]
+
+    def get_top_widgets(self, count=None):
+        """
+        Return the (name, mean painting time per frame) of the widgets which
+        took the longest to paint.
+        """
+
+        totals = collections.Counter()
+        for frame in self.frames:
+            for name, start, duration in frame.widgets:
+                totals[name] += duration
+        frames = max(len(self.frames), 1)
+        return [(name, total / frames) for name, total in \
+            totals.most_common(count or App.PROFILER_TOP_WIDGETS)]
+
+    def get_summary(self):
+        frame_times = sorted(self.get_frame_times())
+        if not frame_times:
+            return {"frames": len(self.frames)}
+
+        phases = collections.Counter()
+        for frame in self.frames:
+            for name, start, duration in frame.phases:
+                phases[name] += duration
+        mean = sum(frame_times) / len(frame_times)
+        return {
+            "frames": len(self.frames),
+            "fps": 1 / mean if mean else 0,
+            "frame_time_mean": mean,
+            "frame_time_p95": frame_times[int(len(frame_times) * 0.95)],
+            "frame_time_max": frame_times[-1],
+            "phases": {name: total / len(self.frames) for name, total in \
+                phases.items()},
+            "top_widgets": self.get_top_widgets()
+        }
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+
+    def draw_overlay(self, surface):
+        if not self.overlay or not surface or len(self.frames) < 2:
+            return
+
+        now = time.perf_counter()
+        if not self.overlay_surface \
+        or now - self.overlay_time >= App.PROFILER_OVERLAY_PERIOD:
+            self.overlay_surface = self.render_overlay()
+            self.overlay_time = now
+
+        rect = self.overlay_surface.get_rect(topleft=App.PROFILER_OVERLAY_POS)
+        rect = rect.clip(surface.get_rect())
+        if not rect.w or not rect.h:
+            return
+
+        saved = surface.subsurface(rect).copy()
+        surface.blit(self.overlay_surface, rect)
+        pygame.display.update(rect)
+        surface.blit(saved, rect)
+
+    def render_overlay(self):
+        if not self.font:
+            self.font = pygame.font.Font(None, 18)
+
+        width, height = App.PROFILER_OVERLAY_SIZE
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 180))
+
+        frame_times = self.get_frame_times()
+        mean = sum(frame_times) / len(frame_times)
+        lines = ["%.1f fps  %.2f ms (max %.2f ms)" % (1 / mean if mean else 0, \
+            mean * 1000, max(frame_times) * 1000)]
+        lines.extend("%s  %.3f ms" % (name, duration * 1000) for name, \
+            duration in self.get_top_widgets())
+
+        y = 4
+        for line in lines:
+            text = self.font.render(line, True, (255, 255, 255))
+            surface.blit(text, (4, y))
+            y += text.get_height()
+
+        # Frame times graph, the line marking 60 fps
+        graph_top = y + 4
+        graph_height = height - graph_top - 4
+        scale = graph_height / max(max(frame_times), 2 / 60)
+        bars = frame_times[-(width - 8):]
+        for x, frame_time in enumerate(bars):
+            bar_height = max(1, int(frame_time * scale))
+            color = (80, 220, 80) if frame_time <= 1 / 55 else (230, 80, 60)
+            pygame.draw.line(surface, color, (4 + x, graph_top + graph_height), \
+                (4 + x, graph_top + graph_height - bar_height))
+        reference = graph_top + graph_height - int(scale / 60)
+        pygame.draw.line(surface, (255, 255, 255, 120), (4, reference), \
+            (width - 4, reference))
+        return surface
+
+    def get_trace_events(self):
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, \
+            "args": {"name": name}} for tid, name in THREAD_NAMES.items()]
+
+        def add_event(name, category, tid, start, duration):
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": duration * 1e6,
+                "pid": 1,
+                "tid": tid
+            })
+
+        for frame in self.frames:
+            add_event("frame", "frame", FRAME_THREAD, frame.start, \
+                frame.end - frame.start)
+            for name, start, duration in frame.phases:
+                add_event(name, "phase", FRAME_THREAD, start, duration)
+            for name, start, duration in frame.widgets:
+                add_event(name, "widget", WIDGET_THREAD, start, duration)
+            for name, start, duration in frame.tasks:
+                add_event(name, "task", TASK_THREAD, start, duration)
+            events.append({
+                "name": "rects",
+                "ph": "C",
+                "ts": frame.start * 1e6,
+                "pid": 1,
+                "args": {"submitted": frame.rects[0], "pushed": frame.rects[1]}
+            })
+        return events
+
+    def dump_trace(self, path=None):
+        """
+        Write the recorded frames as a Chrome trace (chrome://tracing or
+        Perfetto) to path, or to the trace path of the profiler.
+        """
+
+        path = path or self.trace_path
+        if not path:
+            print("[lemapi] [WARNING] [Frame_profiler.dump_trace] No trace " \
+                + "path given")
+            return
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.get_trace_events(), \
+                "displayTimeUnit": "ms"}, file)
+        print("[lemapi] [INFO] [Frame_profiler.dump_trace] %s frames " % \
+            len(self.frames) + "written to '%s'" % path)
+
+
+def get_task_name(task):
+    # Waits of coroutines are named after their coroutine
+    owner = getattr(task, "task", None)
+    if owner is not None and hasattr(owner, "coroutine"):
+        return "%s (%s)" % (getattr(owner.coroutine, "__qualname__", \
+            "coroutine"), type(task).__name__)
+
+    fct = getattr(task, "fct", None)
+    if fct is None and hasattr(task, "event"):
+        fct = task.event.fct
+    if fct is not None:
+        return getattr(fct, "__qualname__", repr(fct))
+    return type(task).__name__
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides an input recorder and an input player. The recorder writes, for each
+frame, its deltatime, the SDL events pumped by the event bus and the state of
+the controls into a compact binary log (gzip compressed). The player reads
+them back in place of the live inputs, so that a session can be replayed
+headless and timed.
+
+Created on 18/10/2026
+"""
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+import gzip
+import json
+import struct
+import time
+
+MAGIC = b"LEMREC01"
+FRAME = struct.Struct("<dHB")
+EVENT_TYPE = struct.Struct("<I")
+INT = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+LENGTH = struct.Struct("<I")
+
+# Events are stamped again when replayed
+IGNORED_ATTRIBUTES = ("timestamp",)
+
+
+class Input_recorder(object):
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, "wb")
+        self.file.write(MAGIC)
+        self.events = []
+        self.frames = 0
+
+    def add_events(self, events):
+        for event in events:
+            attributes = {}
+            for key, value in event.dict.items():
+                if key not in IGNORED_ATTRIBUTES and is_encodable(value):
+                    attributes[key] = value
+            self.events.append((event.type, attributes))
+
+    def write_frame(self, deltatime, control_state=None):
+        buffer = bytearray(FRAME.pack(deltatime, len(self.events), \
+            control_state is not None))
+        for type, attributes in self.events:
+            buffer += EVENT_TYPE.pack(type)
+            encode_value(attributes, buffer)
+        if control_state is not None:
+            encode_value((control_state.joy_x, control_state.joy_y, \
+                tuple(sorted(control_state.buttons))), buffer)
+
+        self.file.write(buffer)
+        self.events.clear()
+        self.frames += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            print("[lemapi] [INFO] [Input_recorder.close] %s frames " % \
+                self.frames + "recorded in '%s'" % self.path)
+
+
+class Input_player(object):
+    """
+    Read frames from an input log. next_frame() loads the events and the
+    control state of the next frame and returns its deltatime, or None when
+    the log is over.
+    """
+
+    def __init__(self, path, report_path=None):
+        self.path = path
+        self.report_path = report_path
+        self.file = gzip.open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("'%s' is not an input log" % path)
+
+        self.events = []
+        self.control_state = None
+        self.frame_times = []
+        self.start_time = None
+        self.last_time = None
+
+    def next_frame(self):
+        now = time.perf_counter()
+        if self.last_time is None:
+            self.start_time = now
+        else:
+            self.frame_times.append(now - self.last_time)
+        self.last_time = now
+
+        try:
+            header = self.file.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return None
+            deltatime, nb_events, has_state = FRAME.unpack(header)
+
+            self.events = []
+            for i in range(nb_events):
+                type, = EVENT_TYPE.unpack(self.file.read(EVENT_TYPE.size))
+                self.events.append((type, decode_value(self.file)))
+
+            self.control_state = decode_value(self.file) if has_state else None
+        except (EOFError, struct.error):
+            # A log whose recording was interrupted ends at its last full frame
+            return None
+        return deltatime
+
+    def get_report(self):
+        frame_times = sorted(self.frame_times)
+        if not frame_times:
+            return {"frames": 0}
+        return {
+            "log": self.path,
+            "frames": len(frame_times),
+            "total_time": self.last_time - self.start_time,
+            "frame_time_mean": sum(frame_times) / len(frame_times),
+            "frame_time_median": frame_times[len(frame_times) // 2],
+            "frame_time_p95": frame_times[int(len(frame_times) * 0.95)],
+            "frame_time_max": frame_times[-1]
+        }
+
+    def close(self):
+        self.file.close()
+        report = self.get_report()
+        print("[lemapi] [INFO] [Input_player.close] Replayed %s frames " % \
+            report["frames"] + "in %.3f s" % report.get("total_time", 0))
+        if self.report_path:
+            with open(self.report_path, "w") as file:
+                json.dump(report, file, indent="\t")
+
+
+def is_encodable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (tuple, list)):
+        return all(is_encodable(item) for item in value)
+    return False
+
+
+def encode_value(value, buffer):
+    if value is None:
+        buffer += b"N"
+    elif value is True:
+        buffer += b"T"
+    elif value is False:
+        buffer += b"F"
+    elif isinstance(value, int):
+        buffer += b"i" + INT.pack(value)
+    elif isinstance(value, float):
+        buffer += b"d" + FLOAT.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        buffer += b"s" + LENGTH.pack(len(data)) + data
+    elif isinstance(value, (tuple, list)):
+        buffer += b"t" + LENGTH.pack(len(value))
+        for item in value:
+            encode_value(item, buffer)
+    elif isinstance(value, dict):
+        buffer += b"m" + LENGTH.pack(len(value))
+        for key, item in value.items():
+            encode_value(key, buffer)
+            encode_value(item, buffer)
+    else:
+        raise TypeError("Unable to encode %r" % (value,))
+
+
+def decode_value(file):
+    tag = file.read(1)
+    if tag == b"N":
+        return None
+    elif tag == b"T":
+        return True
+    elif tag == b"F":
+        return False
+    elif tag == b"i":
+        return INT.unpack(file.read(INT.size))[0]
+    elif tag == b"d":
+        return FLOAT.unpack(file.read(FLOAT.size))[0]
+    elif tag == b"s":
+        length, = LENGTH.unpack(file.read(LENGTH.size))
+        return file.read(length).decode("utf-8")
+    elif tag == b"t":
+        length, = LENGTH.unpack(file.read(LENGTH.size))
+        return tuple(decode_value(file) for i in range(length))
+    elif tag == b"m":
+        length, = LENGTH.unpack(file.read(LENGTH.size))
+        return {decode_value(file): decode_value(file) for i in range(length)}
+    raise EOFError("Unexpected tag %r in input log" % tag)
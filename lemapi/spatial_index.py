@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Provides a uniform grid indexing the bounds of widgets, so that pointer
+events are only given to the widgets under the cursor instead of all of them.
+
+Created on 18/10/2026
+"""
+
+from lemapi.constants import App
+
+__author__ = "Julien Dubois"
+__version__ = "0.1.0"
+
+from pygame.locals import MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEMOTION
+
+POINTER_EVENTS = (MOUSEMOTION, MOUSEBUTTONDOWN, MOUSEBUTTONUP)
+
+
+class Spatial_grid(object):
+    """
+    Uniform grid of item bounds, given by get_bounds(item) as pygame.Rect.
+
+    Items are indexed again lazily: invalidating an item (which happens each
+    time a widget moves or changes) only marks it, its cells are computed on
+    the next query.
+    """
+
+    def __init__(self, get_bounds, cell_size=None):
+        self.get_bounds = get_bounds
+        self.cell_size = cell_size or App.SPATIAL_GRID_CELL_SIZE
+        self.cells = {}
+        # item: [order, bounds, cells], the order giving the z-order
+        self.entries = {}
+        self.pending = set()
+        self.counter = 0
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def add(self, item):
+        self.remove(item)
+        self.counter += 1
+        self.entries[item] = [self.counter, None, ()]
+        self.pending.add(item)
+
+    def remove(self, item):
+        entry = self.entries.pop(item, None)
+        if entry:
+            self.unlink(item, entry[2])
+        self.pending.discard(item)
+
+    def invalidate(self, item):
+        if item in self.entries:
+            self.pending.add(item)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.pending.clear()
+
+    def unlink(self, item, cells):
+        for cell in cells:
+            items = self.cells[cell]
+            items.discard(item)
+            if not items:
+                del self.cells[cell]
+
+    def reindex(self):
+        size = self.cell_size
+        for item in self.pending:
+            entry = self.entries[item]
+            self.unlink(item, entry[2])
+
+            bounds = self.get_bounds(item)
+            cells = tuple((x, y) \
+                for x in range(bounds.left // size, bounds.right // size + 1) \
+                for y in range(bounds.top // size, bounds.bottom // size + 1))
+            for cell in cells:
+                self.cells.setdefault(cell, set()).add(item)
+            entry[1], entry[2] = bounds, cells
+        self.pending.clear()
+
+    def query(self, pos, extra_items=()):
+        """
+        Return the items whose bounds contain pos, along with the indexed
+        extra_items, sorted by z-order (bottom first).
+        """
+
+        if self.pending:
+            self.reindex()
+
+        px, py = pos
+        size = self.cell_size
+        items = set(extra_items).intersection(self.entries)
+
+        # Edges are included, like in Widget.isInWidget
+        for item in self.cells.get((int(px // size), int(py // size)), ()):
+            bounds = self.entries[item][1]
+            if bounds.left <= px <= bounds.right \
+            and bounds.top <= py <= bounds.bottom:
+                items.add(item)
+
+        return sorted(items, key=lambda item: self.entries[item][0])
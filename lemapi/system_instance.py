@@ -16,6 +16,11 @@ class Instance(object):
     audio_player = None
     activities = []
     listener_manager = None
+    event_bus = None
+    main_loop = None
+    control_sampler = None
+    latency_tracer = None
+    profiler = None
     audio_player = None
     task_manager = None
     settings = {}
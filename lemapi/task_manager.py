@@ -6,41 +6,303 @@ Provides classes to manage delayed functions or asynchronous running.
 Created on 20/01/2019
 """
 
+from lemapi.constants import App
 from lemapi.event_manager import Event
+from lemapi.system_instance import Instance
 
 __author__ = "Julien Dubois"
 __version__ = "0.1.0"
 
+import collections
+import concurrent.futures
+import heapq
+import itertools
 import multiprocessing
+import os
+import queue
+import time
+import traceback
+
+TIME_EPSILON = 1e-9
 
 
 class Task_manager(object):
+    """
+    Run tasks in the time given by the deltatimes of update().
+
+    Delayed tasks (Task_delay and Loop_task_delay) wait in a min-heap sorted
+    by due time and are only touched when due. Polled tasks (like
+    Analog_task_delay, or any task without a due time) are updated each
+    frame.
+
+    add_task() returns the task, which is its handle: stopping it (or giving
+    it to cancel()) cancels it in O(1), the heap dropping it lazily. Tasks
+    can be anonymous (name None), so that unique names are not needed.
+
+    Coroutines (generators or "async def" functions) given to
+    add_coroutine() wait for a frame (Next_frame), a delay (Delay) or a tween
+    (Tween). Their waits are scheduled as tasks, so that a waiting coroutine
+    is only resumed when its wait is over.
+
+    Background jobs (Background_job) run on a pool of App.JOB_WORKERS
+    threads, or of processes. At most App.JOB_QUEUE_SIZE jobs wait for a
+    worker. Their progress and their results are given to their callbacks
+    by update(), on the main loop.
+    """
+
     def __init__(self):
         self.tasks = {}
+        self.time = 0
+        self.timers = []
+        self.polled = []
+        self.counter = itertools.count()
+        self.cancelled = 0
+        self.updating = False
+        self.added = []
+
+        self.waiting_jobs = collections.deque()
+        self.running_jobs = []
+        self.finished_jobs = queue.SimpleQueue()
+        self.thread_pool = None
+        self.process_pool = None
 
     def add_task(self, name, task):
-        if name not in self.tasks:
+        if name is not None:
+            if name in self.tasks and not self.tasks[name].obsolete:
+                return self.tasks[name]
             self.tasks[name] = task
+        task.task_name = name
+
+        # Tasks added while updating start on the next update
+        if self.updating:
+            self.added.append(task)
+        else:
+            self.schedule(task)
+        return task
+
+    def add_coroutine(self, name, coroutine):
+        """
+        Start a coroutine and return its Coroutine_task, or return the live
+        task already added under this name.
+        """
+
+        if name in self.tasks and not self.tasks[name].obsolete:
+            coroutine.close()
+            return self.tasks[name]
+        return self.add_task(name, Coroutine_task(self, coroutine))
+
+    def schedule(self, task):
+        if isinstance(task, Coroutine_task):
+            # Run up to its first wait
+            task.resume()
+        elif getattr(task, "polled", True):
+            self.polled.append(task)
+        else:
+            heapq.heappush(self.timers, (self.time + task.delay, \
+                next(self.counter), task))
+
+    def cancel(self, task):
+        if not task.obsolete:
+            task.stop()
+            if getattr(task, "polled", True):
+                return
+            self.cancelled += 1
+
+            # Cancelled timers are only dropped when due, unless they take
+            # most of the heap (compacted in place, as update() may be
+            # popping it)
+            if self.cancelled > 64 and self.cancelled > len(self.timers) // 2:
+                self.timers[:] = [timer for timer in self.timers \
+                    if not timer[2].obsolete]
+                heapq.heapify(self.timers)
+                self.cancelled = 0
+
+    def release(self, task):
+        name = getattr(task, "task_name", None)
+        if name is not None and self.tasks.get(name) is task:
+            self.tasks.pop(name)
 
     def remove_task(self, name):
         if name in self.tasks:
-            self.tasks[name].stop()
-            self.tasks.pop(name)
+            self.cancel(self.tasks.pop(name))
+
+    def get_next_deadline(self):
+        """
+        Return the time until the next delayed task is due, 0 if tasks or
+        jobs need the next update, or None if nothing is pending.
+        """
+
+        if self.polled or self.added or self.running_jobs or self.waiting_jobs:
+            return 0
+
+        timers = self.timers
+        while timers and timers[0][2].obsolete:
+            task = heapq.heappop(timers)[2]
+            if self.cancelled:
+                self.cancelled -= 1
+            self.release(task)
+        if timers:
+            return max(timers[0][0] - self.time, 0)
+        return None
+
+    def add_job(self, job):
+        """
+        Queue a Background_job and return it (its handle), or return None if
+        App.JOB_QUEUE_SIZE jobs are already waiting.
+        """
+
+        if len(self.waiting_jobs) >= App.JOB_QUEUE_SIZE:
+            print("[lemapi] [WARNING] [Task_manager.add_job] Job queue is " \
+                + "full, job '%s' refused" % getattr(job.fct, "__name__", \
+                job.fct))
+            return None
+
+        self.waiting_jobs.append(job)
+        self.submit_jobs()
+        return job
+
+    def submit_jobs(self):
+        # Jobs are only given to a pool when a worker is free, so that
+        # cancelling a waiting job never has to reach the pool
+        while self.waiting_jobs:
+            job = self.waiting_jobs[0]
+            if job.cancelled:
+                self.waiting_jobs.popleft()
+                continue
+
+            running = sum(1 for other in self.running_jobs \
+                if other.process == job.process)
+            if running >= self.get_workers(job.process):
+                break
+
+            self.waiting_jobs.popleft()
+            if job.process:
+                job.future = self.get_process_pool().submit(job.fct, \
+                    *job.args, **job.kwargs)
+            else:
+                job.future = self.get_thread_pool().submit(job.run)
+            self.running_jobs.append(job)
+            job.future.add_done_callback(lambda future, job=job: \
+                self.finished_jobs.put(job))
+
+    def get_workers(self, process=False):
+        if process:
+            return App.JOB_PROCESSES or os.cpu_count() or 1
+        return App.JOB_WORKERS
+
+    def get_thread_pool(self):
+        if not self.thread_pool:
+            self.thread_pool = concurrent.futures.ThreadPoolExecutor( \
+                self.get_workers(), thread_name_prefix="lemapi_job")
+        return self.thread_pool
+
+    def get_process_pool(self):
+        # Spawned, as forking a process running audio and SDL threads is
+        # not safe
+        if not self.process_pool:
+            self.process_pool = concurrent.futures.ProcessPoolExecutor( \
+                self.get_workers(True), \
+                mp_context=multiprocessing.get_context("spawn"))
+        return self.process_pool
+
+    def update_jobs(self):
+        while True:
+            try:
+                job = self.finished_jobs.get_nowait()
+            except queue.Empty:
+                break
+            self.running_jobs.remove(job)
+            job.finish()
+
+        for job in self.running_jobs:
+            job.report_progress()
+        self.submit_jobs()
 
     def clear(self):
+        for job in tuple(self.waiting_jobs) + tuple(self.running_jobs):
+            job.cancel()
+        self.waiting_jobs.clear()
+        self.running_jobs.clear()
+        for pool in (self.thread_pool, self.process_pool):
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self.thread_pool = None
+        self.process_pool = None
+
         for task in tuple(self.tasks.values()):
             task.stop()
+        for timer in self.timers:
+            timer[2].stop()
+        for task in self.polled + self.added:
+            task.stop()
         self.tasks.clear()
+        self.timers.clear()
+        self.polled.clear()
+        self.added.clear()
+        self.cancelled = 0
 
     def update(self, deltatime):
-        for name, task in tuple(self.tasks.items()):
-            if task.obsolete:
-                self.tasks.pop(name)
-            else:
-                task.update(deltatime)
+        self.time += deltatime
+        self.updating = True
+        profiler = Instance.profiler
+
+        try:
+            timers = self.timers
+            # Due times are sums of deltatimes, compared with a tolerance
+            while timers and timers[0][0] <= self.time + TIME_EPSILON:
+                due, count, task = heapq.heappop(timers)
+                if not task.obsolete:
+                    task.elapsed_time = task.delay
+                    if profiler:
+                        start = time.perf_counter()
+                        task.call()
+                        profiler.add_task(task, start, time.perf_counter() - \
+                            start)
+                    else:
+                        task.call()
+                    # Loop tasks start again from their call
+                    if not getattr(task, "stopping", True):
+                        task.obsolete = False
+                        task.elapsed_time = 0
+                        heapq.heappush(timers, (self.time + task.delay, \
+                            next(self.counter), task))
+                        continue
+                elif self.cancelled:
+                    self.cancelled -= 1
+                self.release(task)
+
+            if self.polled:
+                polled = self.polled
+                self.polled = []
+                for task in polled:
+                    if task.obsolete:
+                        pass
+                    elif profiler:
+                        start = time.perf_counter()
+                        task.update(deltatime)
+                        profiler.add_task(task, start, time.perf_counter() - \
+                            start)
+                    else:
+                        task.update(deltatime)
+                    if task.obsolete:
+                        self.release(task)
+                    else:
+                        self.polled.append(task)
+        finally:
+            self.updating = False
+            for task in self.added:
+                self.schedule(task)
+            self.added.clear()
+
+        if self.running_jobs or self.waiting_jobs:
+            self.update_jobs()
 
 
 class Task_delay(Event):
+    # Task_delay objects are woken up by the Task_manager when due, instead
+    # of being updated each frame
+    polled = False
+
     def __init__(self, delay, fct, *args, **kwargs):
         self.delay = delay
         self.elapsed_time = 0
@@ -76,19 +338,257 @@ class Loop_task_delay(Task_delay):
 
 
 class Analog_task_delay(Task_delay):
+    polled = True
+
     def __init__(self, delay, fct, *args, **kwargs):
         self.value = 0
         super().__init__(delay, fct, *args, **kwargs)
 
     def update(self, deltatime):
+        # The value is not accumulated, so that it does not drift
         self.elapsed_time += deltatime
-        self.value += deltatime / self.delay
-
-        if self.value > 1:
-            self.value = 1
+        self.value = min(self.elapsed_time / self.delay, 1)
 
         if self.elapsed_time >= self.delay:
             self.obsolete = True
         else:
             self.call(self.value)
-            self.obsolete = False
\ No newline at end of file
+            self.obsolete = False
+
+
+class Coroutine_task(object):
+    """
+    Coroutine run by the Task_manager. The coroutine yields (or awaits) a
+    Next_frame, a Delay or a Tween, and is resumed when it is over. Yielding
+    None waits for the next frame, and yielding a number waits for this
+    delay in seconds.
+
+    Stopping the task (or cancelling its current wait) closes the coroutine.
+    """
+
+    # Coroutine tasks are never in the heap, only their waits
+    polled = True
+
+    def __init__(self, manager, coroutine):
+        self.manager = manager
+        self.coroutine = coroutine
+        self.obsolete = False
+        self.running = False
+        self.wait = None
+        self.result = None
+
+    def resume(self, value=None):
+        if self.obsolete:
+            return
+
+        self.wait = None
+        self.running = True
+        try:
+            wait = self.coroutine.send(value)
+        except StopIteration as stop:
+            self.result = stop.value
+            self.finish()
+            return
+        except BaseException:
+            self.finish()
+            raise
+        finally:
+            self.running = False
+
+        # Stopped by itself
+        if self.obsolete:
+            self.coroutine.close()
+            return
+
+        if wait is None:
+            wait = Next_frame()
+        elif isinstance(wait, (int, float)):
+            wait = Delay(wait)
+        wait.task = self
+        self.wait = wait
+        self.manager.add_task(None, wait)
+
+    def finish(self):
+        self.obsolete = True
+        self.manager.release(self)
+
+    def stop(self):
+        if self.obsolete:
+            return
+        self.obsolete = True
+
+        if self.wait:
+            self.manager.cancel(self.wait)
+            self.wait = None
+        if not self.running:
+            self.coroutine.close()
+
+
+class Wait(object):
+    """
+    Base of the objects a coroutine task waits for. They are awaitable, so
+    that "async def" coroutines await them, and iterable, so that
+    generators can also "yield from" them. Both give the value given back by
+    the wait.
+    """
+
+    def __init__(self):
+        self.task = None
+        self.obsolete = False
+
+    def __await__(self):
+        return (yield self)
+
+    __iter__ = __await__
+
+    def resume(self, value=None):
+        self.obsolete = True
+        if self.task:
+            self.task.resume(value)
+
+    def stop(self):
+        self.obsolete = True
+        if self.task:
+            self.task.stop()
+
+
+class Next_frame(Wait):
+    """
+    Wait for the next update of the Task_manager, giving its deltatime.
+    """
+
+    polled = True
+
+    def update(self, deltatime):
+        self.resume(deltatime)
+
+
+class Delay(Wait):
+    """
+    Wait for delay seconds, in the heap of the Task_manager.
+    """
+
+    polled = False
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.elapsed_time = 0
+
+    def call(self):
+        self.resume()
+
+
+class Tween(Wait):
+    """
+    Call fct with a value going from 0 to 1 (through easing if given) each
+    frame for duration seconds, ending with 1.
+    """
+
+    polled = True
+
+    def __init__(self, duration, fct, *args, easing=None, **kwargs):
+        super().__init__()
+        self.duration = duration
+        self.elapsed_time = 0
+        self.easing = easing
+        self.event = Event(fct, *args, **kwargs)
+
+    def update(self, deltatime):
+        self.elapsed_time += deltatime
+        if self.duration > 0:
+            value = min(self.elapsed_time / self.duration, 1)
+        else:
+            value = 1
+
+        self.event.call(self.easing(value) if self.easing else value)
+        if value >= 1:
+            self.resume()
+
+
+class Job_cancelled(Exception):
+    pass
+
+
+class Background_job(object):
+    """
+    Function run by the Task_manager on a worker thread, or in a worker
+    process if process is True (fct and its arguments must then be
+    picklable). Its result is given to callback, or the exception it raised
+    to error_callback, on the main loop.
+
+    If progress_callback is given, fct receives a progress keyword argument:
+    a function to call with its progress (any value), which is given to
+    progress_callback on the main loop. It raises Job_cancelled once the job
+    is cancelled, so that long jobs stop early. Jobs run in a process can
+    not report progress.
+    """
+
+    def __init__(self, fct, *args, callback=None, error_callback=None, \
+        progress_callback=None, process=False, **kwargs):
+        if process and progress_callback:
+            raise ValueError("Jobs run in a process can not report progress")
+
+        self.fct = fct
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = callback
+        self.error_callback = error_callback
+        self.progress_callback = progress_callback
+        self.process = process
+        self.future = None
+        self.cancelled = False
+        self.finished = False
+        self.progress = None
+        self.reported_progress = None
+
+    def run(self):
+        # Called on a worker thread
+        if self.cancelled:
+            raise Job_cancelled()
+        if self.progress_callback:
+            return self.fct(*self.args, progress=self.set_progress, \
+                **self.kwargs)
+        return self.fct(*self.args, **self.kwargs)
+
+    def set_progress(self, value):
+        # Called on a worker thread
+        if self.cancelled:
+            raise Job_cancelled()
+        self.progress = value
+
+    def report_progress(self):
+        if self.progress_callback and not self.cancelled \
+        and self.progress != self.reported_progress:
+            self.reported_progress = self.progress
+            self.progress_callback(self.progress)
+
+    def finish(self):
+        self.finished = True
+        if self.cancelled or self.future.cancelled():
+            return
+
+        self.report_progress()
+        error = self.future.exception()
+        if error is None:
+            if self.callback:
+                self.callback(self.future.result())
+        elif self.error_callback:
+            self.error_callback(error)
+        else:
+            print("[lemapi] [WARNING] [Background_job.finish] Job '%s' " % \
+                getattr(self.fct, "__name__", self.fct) + "failed")
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def cancel(self):
+        """
+        Cancel the job: it is not started if still waiting, its callbacks are
+        not called if already running.
+        """
+
+        self.cancelled = True
+        if self.future:
+            self.future.cancel()
+
+    def is_done(self):
+        return self.finished
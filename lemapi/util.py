@@ -6,7 +6,10 @@ Provide useful functions.
 Created on 02/01/2018
 """
 
-from lemapi.api import stop_app, stop_all_activities, stop_audio_player, get_task_manager
+from lemapi.api import stop_app, stop_all_activities, stop_audio_player, \
+	stop_control_sampler, stop_latency_tracer, stop_profiler, get_task_manager
+from lemapi.cache import rotation_cache, spinner_cache, stretch_cache, \
+	get_surface_key
 from lemapi.constants import App
 from lemapi.system_instance import Instance
 
@@ -69,49 +72,125 @@ def invert_image(image, vertical, horizontal):
 	return pygame.transform.flip(image, vertical, horizontal)
 
 def stretch_image(image, new_size, border_size):
+	"""
+	Stretch an image without distorting its borders (nine-slice scaling).
+	Stretched images are shared through a cache and must not be modified.
+	"""
+
 	new_size = (int(new_size[0]), int(new_size[1]))
+	w, h = image.get_size()
+
 	if border_size < new_size[0] / 2 and border_size < new_size[1] / 2:
-		if image.get_alpha() == None:
-			back = pygame.Surface(new_size).convert()
-		else:
-			back = pygame.Surface(new_size, pygame.SRCALPHA, 32).convert_alpha()
-
-		side_len = (image.get_size()[0] - border_size * 2, image.get_size()[1] \
-			- border_size * 2)
-		new_size_len = (new_size[0] - border_size * 2, new_size[1] - border_size * 2)
-
-		back.blit(image.subsurface((0, 0), (border_size, border_size)).copy(), (0, 0))
-		back.blit(pygame.transform.scale(image.subsurface((border_size, 0), \
-			(side_len[0], border_size)).copy(), (new_size_len[0], border_size)), \
-			(border_size, 0))
-		back.blit(image.subsurface((side_len[0] + border_size, 0), \
-			(border_size, border_size)).copy(), (new_size_len[0] + border_size, 0))
-		back.blit(pygame.transform.scale(image.subsurface((0, border_size), \
-			(border_size, side_len[1])).copy(), (border_size,  new_size_len[1])), \
-			(0, border_size))
-		back.blit(pygame.transform.scale(image.subsurface((border_size, border_size), \
-			(side_len[0], side_len[1])), (new_size_len[0], new_size_len[1])), \
-			(border_size, border_size))
-		back.blit(pygame.transform.scale(image.subsurface((side_len[0] \
-			+ border_size, border_size), (border_size, side_len[1])).copy(), \
-			(border_size, new_size_len[1])), (new_size_len[0] + border_size, \
-			border_size))
-		back.blit(image.subsurface((0, side_len[1] + border_size), (border_size, \
-			border_size)).copy(), (0, new_size_len[1] + border_size))
-		back.blit(pygame.transform.scale(image.subsurface((border_size, side_len[1] \
-			+ border_size), (side_len[0], border_size)).copy(), (new_size_len[0], \
-			border_size)), (border_size, new_size_len[1] + border_size))
-		back.blit(image.subsurface((side_len[0] + border_size, side_len[1] + \
-			border_size), (border_size, border_size)).copy(), (new_size_len[0] + \
-			border_size, new_size_len[1] + border_size))
-		return back
+		if border_size * 2 >= w or border_size * 2 >= h:
+			print("[lemapi] [WARNING] [util.stretch_image] border_size must be " \
+				+ "inferior to the half size of the source image")
+			return image
+
+		key = (get_surface_key(image), new_size, border_size, \
+			image.get_alpha() != None)
+		return stretch_cache.get_or_create(key, build_stretched_image, image, \
+			new_size, border_size)
 	print("[lemapi] [WARNING] [util.stretch_image] border_size must be inferior to the half size" \
 		+ " of the surface")
 	return image
 
 
-def rotate_image(image, angle):
-	return pygame.transform.rotate(image, angle)
+def build_stretched_image(image, new_size, border_size):
+	if image.get_alpha() == None:
+		back = pygame.Surface(new_size).convert()
+	else:
+		back = pygame.Surface(new_size, pygame.SRCALPHA, 32).convert_alpha()
+
+	side_len = (image.get_size()[0] - border_size * 2, image.get_size()[1] \
+		- border_size * 2)
+	new_size_len = (new_size[0] - border_size * 2, new_size[1] - border_size * 2)
+
+	back.blit(image.subsurface((0, 0), (border_size, border_size)), (0, 0))
+	back.blit(pygame.transform.scale(image.subsurface((border_size, 0), \
+		(side_len[0], border_size)), (new_size_len[0], border_size)), \
+		(border_size, 0))
+	back.blit(image.subsurface((side_len[0] + border_size, 0), \
+		(border_size, border_size)), (new_size_len[0] + border_size, 0))
+	back.blit(pygame.transform.scale(image.subsurface((0, border_size), \
+		(border_size, side_len[1])), (border_size,  new_size_len[1])), \
+		(0, border_size))
+	back.blit(pygame.transform.scale(image.subsurface((border_size, border_size), \
+		(side_len[0], side_len[1])), (new_size_len[0], new_size_len[1])), \
+		(border_size, border_size))
+	back.blit(pygame.transform.scale(image.subsurface((side_len[0] \
+		+ border_size, border_size), (border_size, side_len[1])), \
+		(border_size, new_size_len[1])), (new_size_len[0] + border_size, \
+		border_size))
+	back.blit(image.subsurface((0, side_len[1] + border_size), (border_size, \
+		border_size)), (0, new_size_len[1] + border_size))
+	back.blit(pygame.transform.scale(image.subsurface((border_size, side_len[1] \
+		+ border_size), (side_len[0], border_size)), (new_size_len[0], \
+		border_size)), (border_size, new_size_len[1] + border_size))
+	back.blit(image.subsurface((side_len[0] + border_size, side_len[1] + \
+		border_size), (border_size, border_size)), (new_size_len[0] + \
+		border_size, new_size_len[1] + border_size))
+	return back
+
+
+def rotate_image(image, angle, step=None):
+	"""
+	Return image rotated by angle degrees. The angle is rounded to a multiple
+	of step (App.ROTATION_STEP by default) and the rotated frames are kept in
+	the rotation cache, so that spinning sprites (like the waiting wheel) only
+	cost a blit once their frames are filled. A step of 0 rotates without
+	cache.
+
+	Images whose frames of a full turn don't fit in the cache budget are
+	rotated each time: caching them would only evict frames before they are
+	used again. Large round spinners use rotate_round_image instead.
+	"""
+
+	step = App.ROTATION_STEP if step is None else step
+	# Rotated frames take up to twice the pixels of the image (at 45°)
+	if not step or 360 / step * image.get_pitch() * image.get_height() * 2 \
+	> rotation_cache.budget:
+		return pygame.transform.rotate(image, angle)
+
+	angle = round(angle / step) * step % 360
+	if angle == 0:
+		return image
+
+	key = (get_surface_key(image), angle)
+	return rotation_cache.get_or_create(key, pygame.transform.rotate, image, \
+		angle)
+
+
+def rotate_round_image(image, angle, step=None):
+	"""
+	Return a round image (whose content stays in its inscribed circle)
+	rotated by angle degrees around its center, keeping its size. The angle is
+	rounded to a multiple of step (App.SPINNER_ROTATION_STEP by default) and
+	the frames are kept in the spinner cache if a full turn fits in it, for
+	large spinning images whose frames at App.ROTATION_STEP would not. A step
+	of 0 rotates without cache.
+	"""
+
+	step = App.SPINNER_ROTATION_STEP if step is None else step
+	if not step or 360 / step * image.get_pitch() * image.get_height() \
+	> spinner_cache.budget:
+		return rotate_cropped_image(image, angle)
+
+	angle = round(angle / step) * step % 360
+	if angle == 0:
+		return image
+
+	key = (get_surface_key(image), angle)
+	return spinner_cache.get_or_create(key, rotate_cropped_image, image, \
+		angle, copy=True)
+
+
+def rotate_cropped_image(image, angle, copy=False):
+	# The corners of the rotated image are empty for round images. Cached
+	# frames are copied out of the rotated image, not to keep all its pixels
+	rotated = pygame.transform.rotate(image, angle)
+	cropped = rotated.subsurface(image.get_rect(center=rotated.get_rect() \
+		.center))
+	return cropped.copy() if copy else cropped
 
 
 ################################################################################
@@ -210,6 +289,13 @@ def exit(errorLevel=0):
 	stop_app()
 	Instance.activities[0].destroy()
 	stop_audio_player()
+	stop_control_sampler()
+	stop_latency_tracer()
+	stop_profiler()
+	if Instance.main_loop:
+		Instance.main_loop.print_duty_cycle()
+	if Instance.event_bus:
+		Instance.event_bus.stop_recording()
 	get_task_manager().clear()
 	sys.exit(errorLevel)
 
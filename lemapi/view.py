@@ -1,6 +1,9 @@
 # -*- coding: utf -*-
 
 from lemapi.api import get_gui
+from lemapi.gui import merge_rects
+from lemapi.spatial_index import POINTER_EVENTS, Spatial_grid
+from lemapi.system_instance import Instance
 from lemapi.widget import Toast_widget
 
 __author__ = "Julien Dubois"
@@ -9,12 +12,22 @@ __version__ = "0.1.0"
 import os
 import collections
 import random
+import time
 
 
 class View(object):
+
+    # In retained mode, only dirty widgets and the widgets they overlap are
+    # repainted, clipped to the damaged area
+    RETAINED_MODE = False
+    BACKGROUND_COLOR = (0, 0, 0)
+
     def __init__(self):
         self.widgets = collections.OrderedDict()
         self.toast = None
+        self.damaged_rects = []
+        self.spatial_grid = Spatial_grid(lambda widget: widget.getBounds())
+        self.pointer_widgets = ()
         self.init_widgets()
 
     def init_widgets(self):
@@ -22,40 +35,147 @@ class View(object):
 
     def add_widget(self, wname, wtype, pos, *wargs, **wkargs):
         if wname in self.widgets:
+            self.damage_widget(self.widgets[wname])
             self.widgets[wname].destroy()
+            self.spatial_grid.remove(self.widgets[wname])
         gui = get_gui()
-        self.widgets[wname] = wtype(gui, pos, *wargs, **wkargs)
+        widget = wtype(gui, pos, *wargs, **wkargs)
+        widget.name = wname
+        widget.spatialGrid = self.spatial_grid
+        self.spatial_grid.add(widget)
+        self.widgets[wname] = widget
 
     def add_toast(self, message, **kwargs):
+        if self.toast:
+            self.damage_widget(self.toast)
         self.toast = Toast_widget(get_gui(), (400, 400), message, **kwargs)
 
     def remove_widget(self, wname):
         if wname in self.widgets:
+            self.damage_widget(self.widgets[wname])
             self.widgets[wname].destroy()
-            self.widgets.pop(wname)
+            self.spatial_grid.remove(self.widgets.pop(wname))
 
     def remove_toast(self):
         if self.toast:
+            self.damage_widget(self.toast)
             self.toast.destroy()
             self.toast = None
 
     def clear(self):
         for name, widget in tuple(self.widgets.items()):
+            self.damage_widget(widget)
             widget.destroy()
             self.widgets.pop(name)
+        self.spatial_grid.clear()
+        self.pointer_widgets = ()
+
+    def damage_widget(self, widget):
+        if widget.paintedRect:
+            self.damaged_rects.append(widget.paintedRect)
+            self.trace_damage()
+
+    def invalidate(self):
+        self.damaged_rects.append(((0, 0), get_gui().get_size()))
+        self.trace_damage()
+
+    def trace_damage(self):
+        if Instance.latency_tracer:
+            Instance.latency_tracer.on_damage()
+
+    def get_drawn_widgets(self):
+        widgets = list(self.widgets.values())
+        if self.toast:
+            widgets.append(self.toast)
+        return widgets
 
     def update(self):
-        for widget in tuple(self.widgets.values()):
+        if self.RETAINED_MODE:
+            self.update_retained()
+        else:
+            for widget in tuple(self.widgets.values()):
+                self.paint_widget(widget)
+
+            if self.toast:
+                self.paint_widget(self.toast)
+
+    def paint_widget(self, widget):
+        profiler = Instance.profiler
+        if profiler:
+            start = time.perf_counter()
+            widget.update()
+            profiler.add_widget(self.get_widget_name(widget), start, \
+                time.perf_counter() - start)
+        else:
             widget.update()
 
-        if self.toast:
-            self.toast.update()
+    def get_widget_name(self, widget):
+        return widget.name or type(widget).__name__
+
+    def update_retained(self):
+        widgets = self.get_drawn_widgets()
+        damaged_rects = self.damaged_rects
+        self.damaged_rects = []
+
+        for widget in widgets:
+            widget.refresh()
+
+        for widget in widgets:
+            if widget.isDirty():
+                damaged_rects.append(widget.getBounds())
+                if widget.paintedRect:
+                    damaged_rects.append(widget.paintedRect)
+
+        if not damaged_rects:
+            return
+
+        gui = get_gui()
+        painted = {}
+
+        for rect in merge_rects(damaged_rects):
+            gui.set_clip(rect)
+            gui.draw_color(self.BACKGROUND_COLOR, rect.topleft, rect.size)
+
+            for widget in widgets:
+                bounds = painted.get(widget) or widget.getBounds()
+                if bounds.colliderect(rect):
+                    self.paint_widget(widget)
+                    painted[widget] = bounds
+        gui.set_clip(None)
+
+        for widget in widgets:
+            if widget not in painted:
+                widget.clean()
+
+        for widget, bounds in painted.items():
+            widget.paintedRect = widget.getBounds()
+            widget.clean()
+
+            # Widgets which changed their size while painting (like texts)
+            # must be cleaned up next frame
+            if widget.paintedRect != bounds:
+                self.damaged_rects.append(bounds)
+                self.damaged_rects.append(widget.paintedRect)
 
     def updateEvent(self, event):
-        for widget in tuple(self.widgets.values()):
+        # Pointer events only go to the widgets under the cursor, and to the
+        # widgets which were hovered or clicked by the previous pointer events
+        # (so that they end their hover, click or drag), in z-order
+        if event.type in POINTER_EVENTS:
+            widgets = self.spatial_grid.query(event.pos, self.pointer_widgets)
+        else:
+            widgets = tuple(self.widgets.values())
+
+        for widget in widgets:
             widget.onEvent(event)
 
+        if event.type in POINTER_EVENTS:
+            self.pointer_widgets = tuple(widget for widget in widgets \
+                if widget.needsPointerEvents())
+
     def destroy(self):
         for widget in tuple(self.widgets.values()):
             widget.destroy()
         self.widgets.clear()
+        self.spatial_grid.clear()
+        self.pointer_widgets = ()
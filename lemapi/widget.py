@@ -8,8 +8,11 @@ Created on 28/03/2018
 """
 
 from lemapi.api import request_keyboard, close_keyboard, get_task_manager, get_view
+from lemapi.cache import text_cache
 from lemapi.constants import Path
 from lemapi.event_manager import Event
+from lemapi.spatial_index import POINTER_EVENTS, Spatial_grid
+from lemapi.system_instance import Instance
 from lemapi.task_manager import Analog_task_delay
 from lemapi.util import resize_image, stretch_image, rotate_image
 
@@ -19,7 +22,6 @@ __version__ = "1.1.2"
 import collections
 import os
 import pygame.freetype
-import random
 import time
 
 from os.path import join
@@ -39,6 +41,12 @@ class Widget:
 		self.pos = tuple(pos)
 		self.isDestroyed = False
 		self.kwargs = dict(kwargs)
+		self.dirty = True
+		self.paintedRect = None
+		self.parent = None
+		self.spatialGrid = None
+		# Name given by the view holding this widget
+		self.name = None
 
 	@classmethod
 	def updateDefaultKwargs(cls, kwargs):
@@ -49,12 +57,39 @@ class Widget:
 	def update(self):
 		pass
 
+	def refresh(self):
+		"""
+		Called each frame by a retained mode view before repainting. Widgets
+		whose appearance depends on time should mark themselves dirty here.
+		"""
+		pass
+
 	def onEvent(self, event):
 		pass
 
 	def config(self, **kwargs):
 		for key, value in kwargs.items():
 			self.kwargs[key] = value
+		self.markDirty()
+
+	def markDirty(self):
+		self.dirty = True
+		# Bounds never change without the widget being marked dirty
+		self.invalidateBounds()
+		if Instance.latency_tracer:
+			Instance.latency_tracer.on_damage()
+
+	def invalidateBounds(self):
+		if self.spatialGrid:
+			self.spatialGrid.invalidate(self)
+		if self.parent:
+			self.parent.invalidateBounds()
+
+	def isDirty(self):
+		return self.dirty
+
+	def clean(self):
+		self.dirty = False
 
 	def getRealPos(self):
 		x, y = self.pos
@@ -63,6 +98,15 @@ class Widget:
 
 		return (int(x - w * (ax + 1) / 2), int(y - h * (ay + 1) / 2))
 
+	def getRect(self):
+		return pygame.Rect(self.getRealPos(), self.kwargs["size"])
+
+	def getBounds(self):
+		"""
+		Return the area painted by this widget on its GUI.
+		"""
+		return self.getRect()
+
 	def isInWidget(self, pos):
 		px, py = pos
 		x, y = self.getRealPos()
@@ -70,11 +114,21 @@ class Widget:
 
 		return px >= x and px <= x + w and py >= y and py <= y + h
 
+	def needsPointerEvents(self):
+		"""
+		Return True if this widget must receive pointer events even when they
+		are out of its bounds (to end a hover, a click or a drag).
+		"""
+		return False
+
 	def destroy(self):
 		self.isDestroyed = True
 
 	def setPos(self, pos):
-		self.pos = tuple(pos)
+		pos = tuple(pos)
+		if pos != self.pos:
+			self.pos = pos
+			self.markDirty()
 
 
 class Text(Widget):
@@ -97,25 +151,58 @@ class Text(Widget):
 		Text.updateDefaultKwargs(kwargs)
 		Widget.__init__(self, gui, pos, **kwargs)
 		self.text = text
+		self.renderKey = None
+		self.rendered = None
 		self.createFont()
 
+	@property
+	def text(self):
+		return self._text
+
+	@text.setter
+	def text(self, text):
+		if text != getattr(self, "_text", None):
+			self._text = text
+			self.markDirty()
+
 	def createFont(self):
 		if os.path.exists(self.kwargs["font"]):
 			self.font = pygame.freetype.Font(self.kwargs["font"])
+			self.fontPath = self.kwargs["font"]
 		else:
 			fontname = pygame.freetype.get_default_font()
 			self.font = pygame.freetype.SysFont(fontname, self.kwargs["fontSize"])
+			self.fontPath = fontname
 		kwargs = dict(self.kwargs)
 		kwargs.pop("font")
 		self.config(**kwargs)
 
 	def update(self):
-		surface, rect = self.font.render(str(self.text), \
-			bgcolor=self.kwargs["backgroundColor"])
-		self.kwargs["size"] = (rect.width, rect.height)
+		key = self.getRenderKey()
+
+		# Rendered surfaces are shared between texts and must not be modified
+		if key != self.renderKey:
+			self.rendered = text_cache.get_or_create(key, self.font.render, \
+				str(self.text), bgcolor=self.kwargs["backgroundColor"])
+			self.renderKey = key
+
+		surface, rect = self.rendered
+		if tuple(self.kwargs["size"]) != rect.size:
+			self.kwargs["size"] = rect.size
+			self.invalidateBounds()
 		self.gui.draw_image(surface, self.getRealPos())
 		Widget.update(self)
 
+	def getRenderKey(self):
+		font = self.font
+		bgcolor = self.kwargs["backgroundColor"]
+		if bgcolor:
+			bgcolor = tuple(bgcolor)
+
+		return (self.fontPath, font.size, font.strong, font.wide, font.oblique, \
+			font.underline, font.vertical, tuple(font.fgcolor), bgcolor, \
+			str(self.text))
+
 	def config(self, **kwargs):
 		Widget.config(self, **kwargs)
 		if "font" in  kwargs:
@@ -167,10 +254,12 @@ class Eventable_widget(Widget):
 	def onEvent(self, event):
 		if self.kwargs["enable"]:
 			self.lastEvent = event
+			# Hover callbacks are only called when the hover state changes
 			if event.type == MOUSEMOTION:
 				if self.isInWidget(event.pos):
-					self.onHover()
-				else:
+					if not self.hovered:
+						self.onHover()
+				elif self.hovered:
 					self.onEndHover()
 
 			elif event.type == MOUSEBUTTONDOWN:
@@ -207,28 +296,42 @@ class Eventable_widget(Widget):
 				self.rightClicked)
 		super().update()
 
+	def needsPointerEvents(self):
+		return self.hovered or self.clicked or self.middleClicked \
+			or self.rightClicked
+
 	def onHover(self):
-		self.hovered = True
-		for event in self.hoverEvents:
-			event.call()
+		if not self.hovered:
+			self.hovered = True
+			self.markDirty()
+			for event in self.hoverEvents:
+				event.call()
 
 	def onEndHover(self):
-		self.hovered = False
-		for event in self.endHoverEvents:
-			event.call()
+		if self.hovered:
+			self.hovered = False
+			self.markDirty()
+			for event in self.endHoverEvents:
+				event.call()
 
 	def onClick(self):
-		self.clicked = True
+		if not self.clicked:
+			self.clicked = True
+			self.markDirty()
 		for event in self.clickEvents:
 			event.call()
 
 	def onMiddleClick(self):
-		self.middleClicked = True
+		if not self.middleClicked:
+			self.middleClicked = True
+			self.markDirty()
 		for event in self.middleClickEvents:
 			event.call()
 
 	def onRightClick(self):
-		self.rightClicked = True
+		if not self.rightClicked:
+			self.rightClicked = True
+			self.markDirty()
 		for event in self.rightClickEvents:
 			event.call()
 
@@ -251,18 +354,21 @@ class Eventable_widget(Widget):
 	def onEndClick(self):
 		if self.clicked:
 			self.clicked = False
+			self.markDirty()
 			for event in self.endClickEvents:
 				event.call()
 
 	def onEndMiddleClick(self):
 		if self.middleClicked:
 			self.middleClicked = False
+			self.markDirty()
 			for event in self.endMiddleClickEvents:
 				event.call()
 
 	def onEndRightClick(self):
 		if self.rightClicked:
 			self.rightClicked = False
+			self.markDirty()
 			for event in self.endRightClickEvents:
 				event.call()
 
@@ -272,14 +378,17 @@ class Eventable_widget(Widget):
 	def onEndClickOut(self):
 		if self.clicked:
 			self.clicked = False
+			self.markDirty()
 
 	def onEndMiddleClickOut(self):
 		if self.middleClicked:
 			self.middleClicked = False
+			self.markDirty()
 
 	def onEndRightClickOut(self):
 		if self.rightClicked:
 			self.rightClicked = False
+			self.markDirty()
 
 	def onEndMouseWheelOut(self, direction):
 		pass
@@ -324,6 +433,8 @@ class Button(Eventable_widget):
 		self.backgroundImages = {}
 		self.text = Text(self.gui, self.getTextPos(), self.kwargs["text"], \
 			**self.kwargs["textKwargs"])
+		# The bounds of the button include its text
+		self.text.parent = self
 		self.loadBackgroundImages()
 
 	@classmethod
@@ -392,8 +503,8 @@ class Button(Eventable_widget):
 		Eventable_widget.config(self, **kwargs)
 		if "text" in kwargs:
 			self.text.text = kwargs["text"]
-		if "textAnchor" in kwargs:
-			self.text.pos = self.getTextPos()
+		if "textAnchor" in kwargs or "size" in kwargs or "anchor" in kwargs:
+			self.text.setPos(self.getTextPos())
 		if "textKwargs" in kwargs:
 			self.text.config(**kwargs["textKwargs"])
 
@@ -412,6 +523,16 @@ class Button(Eventable_widget):
 		ax, ay = self.kwargs["textAnchor"]
 		return (x + w * (ax + 1) / 2, y + h * (ay + 1) / 2)
 
+	def isDirty(self):
+		return self.dirty or self.text.isDirty()
+
+	def clean(self):
+		Eventable_widget.clean(self)
+		self.text.clean()
+
+	def getBounds(self):
+		return self.getRect().union(self.text.getBounds())
+
 	def setPos(self, pos):
 		x, y = self.pos
 		nx, ny = pos
@@ -477,8 +598,11 @@ class Image_widget(Widget):
 
 		Image_widget.updateDefaultKwargs(kwargs)
 		Widget.__init__(self, gui, pos, **kwargs)
-		self.change_image(imagePath)
+		self.imageShared = False
+		self.unrotatedImage = None
+		self.angle = 0
 		self.rotated_overflow = [0, 0]
+		self.change_image(imagePath)
 
 	def loadImage(self, imagePath):
 		"""
@@ -488,10 +612,16 @@ class Image_widget(Widget):
 		:param imagePath: The filepath to the image to load.
 		"""
 
-		self.image = self.gui.get_image(imagePath, self.kwargs["alphaChannel"])
 		if self.kwargs["transparentColor"]:
+			self.image = self.gui.get_writable_image(imagePath, \
+				self.kwargs["alphaChannel"])
 			self.image.set_colorkey(self.kwargs["transparentColor"])
+			self.imageShared = False
+		else:
+			self.image = self.gui.get_image(imagePath, self.kwargs["alphaChannel"])
+			self.imageShared = True
 		self.kwargs["size"] = self.image.get_size()
+		self.resetRotation()
 
 	def update(self):
 		"""
@@ -517,16 +647,37 @@ class Image_widget(Widget):
 		if self.kwargs["borderSize"]:
 			self.image = stretch_image(self.image, newSize, \
 			self.kwargs["borderSize"])
+			self.imageShared = True
 		else:
 			self.image = resize_image(self.image, newSize, \
 				self.kwargs["antialiasing"])
+			self.imageShared = False
 		self.kwargs["size"] = tuple(newSize)
+		self.resetRotation()
 
 	def rotate(self, angle):
-		self.image = rotate_image(self.image, angle)
+		"""
+		Rotate the image by angle degrees. Frames are always rotated from the
+		unrotated image, so successive rotations neither blur nor grow it.
+		"""
+
+		if self.unrotatedImage is None:
+			self.unrotatedImage = self.image
+		self.angle = (self.angle + angle) % 360
+		self.image = rotate_image(self.unrotatedImage, self.angle)
+		self.imageShared = True
 		w, h = self.kwargs["size"]
 		sw, sh = self.image.get_size()
 		self.rotated_overflow = [(sw - w) / 2, (sh - h) / 2]
+		self.markDirty()
+
+	def resetRotation(self):
+		self.unrotatedImage = None
+		self.angle = 0
+		self.rotated_overflow = [0, 0]
+
+	def getBounds(self):
+		return pygame.Rect(self.getRealPos(), self.image.get_size())
 
 	def getRealPos(self):
 		x, y = super().getRealPos()
@@ -534,7 +685,19 @@ class Image_widget(Widget):
 		return (x - xo, y - yo)
 
 	def set_opacity(self, opacity):
+		self.makeImageWritable()
 		self.image.set_alpha(int(opacity))
+		self.markDirty()
+
+	def makeImageWritable(self):
+		"""
+		Copy the image if it is shared with other widgets, so that it can be
+		modified safely.
+		"""
+
+		if self.imageShared:
+			self.image = self.image.copy()
+			self.imageShared = False
 
 	def change_image(self, path):
 		tmp_size = self.kwargs["size"]
@@ -542,6 +705,7 @@ class Image_widget(Widget):
 
 		if tmp_size != (0, 0):
 			self.resize(tmp_size)
+		self.markDirty()
 
 	def config(self, **kwargs):
 		Widget.config(self, **kwargs)
@@ -561,6 +725,8 @@ class Menu_widget(Widget):
 		Widget.__init__(self, gui, pos, **kwargs)
 
 		self.subWidgets = collections.OrderedDict()
+		self.subWidgetGrid = Spatial_grid(lambda widget: widget.getBounds())
+		self.pointerWidgets = ()
 		self.backgroundImage = None
 		self.loadBackgroundImage()
 		self.initWidgets()
@@ -589,12 +755,20 @@ class Menu_widget(Widget):
 		self.subWidgets[widgetName] = widgetType(self.gui, \
 			(pos[0] + realPos[0], pos[1] + realPos[1]), *widgetArgs, \
 			**widgetKwargs)
+		self.indexSubWidget(self.subWidgets[widgetName])
+
+	def indexSubWidget(self, widget):
+		widget.parent = self
+		widget.spatialGrid = self.subWidgetGrid
+		self.subWidgetGrid.add(widget)
+		self.invalidateBounds()
 
 	def removeSubWidget(self, widgetName):
 		if widgetName in self.subWidgets:
 			if not self.subWidgets[widgetName].isDestroyed:
 				self.subWidgets[widgetName].destroy()
-			self.subWidgets.pop(widgetName)
+			self.subWidgetGrid.remove(self.subWidgets.pop(widgetName))
+			self.markDirty()
 		else:
 			print("[WARNING] [Menu_widget.removeSubWidget] No widget called " \
 				+ "'%s' in this Menu_widget" % widgetName)
@@ -613,16 +787,57 @@ class Menu_widget(Widget):
 			if not widget.isDestroyed:
 				widget.update()
 
-	def onEvent(self, event):
+	def refresh(self):
 		for widget in tuple(self.subWidgets.values()):
+			if not widget.isDestroyed:
+				widget.refresh()
+
+	def isDirty(self):
+		if self.dirty:
+			return True
+		for widget in self.subWidgets.values():
+			if widget.isDirty():
+				return True
+		return False
+
+	def clean(self):
+		Widget.clean(self)
+		for widget in self.subWidgets.values():
+			widget.clean()
+
+	def getBounds(self):
+		bounds = self.getRect()
+		for widget in self.subWidgets.values():
+			if not widget.isDestroyed:
+				bounds.union_ip(widget.getBounds())
+		return bounds
+
+	def onEvent(self, event):
+		# Pointer events only go to the sub-widgets under the cursor and to
+		# those still hovered or clicked
+		if event.type in POINTER_EVENTS:
+			widgets = self.subWidgetGrid.query(event.pos, self.pointerWidgets)
+		else:
+			widgets = tuple(self.subWidgets.values())
+
+		for widget in widgets:
 			if not widget.isDestroyed:
 				widget.onEvent(event)
 
+		if event.type in POINTER_EVENTS:
+			self.pointerWidgets = tuple(widget for widget in widgets \
+				if widget.needsPointerEvents())
+
+	def needsPointerEvents(self):
+		return bool(self.pointerWidgets) or super().needsPointerEvents()
+
 	def destroy(self):
 		for widget in tuple(self.subWidgets.values()):
 			if not widget.isDestroyed:
 				widget.destroy()
 		self.subWidgets.clear()
+		self.subWidgetGrid.clear()
+		self.pointerWidgets = ()
 		Widget.destroy(self)
 
 	def config(self, **kwargs):
@@ -682,12 +897,12 @@ class Virtual_keyboard(Menu_widget):
 				text="-", size=(nb[0] - m * 2, nb[1] - m * 2))
 
 		for i in range(10, 20):
-			self.addSubWidget(i, Button, (m + nb[0] * i, nb[1] + m), \
+			self.addSubWidget(i, Button, (m + nb[0] * (i - 10), nb[1] + m), \
 				text="-", size=(nb[0] - m * 2, nb[1] - m * 2))
 
 		for i in range(20, 27):
-			self.addSubWidget(char, Button, (bb[0] + m + nb[0] * i, nb[1] * 2 + \
-				m), text=char, size=(nb[0] - m * 2, nb[1] - m * 2))
+			self.addSubWidget(i, Button, (bb[0] + m + nb[0] * (i - 20), nb[1] * 2 \
+				+ m), text="-", size=(nb[0] - m * 2, nb[1] - m * 2))
 
 		self.addSubWidget("maj", Button, (m, nb[1] * 2 + m), text="Maj", \
 			size=(bb[0] - m * 2, bb[1] - m * 2))
@@ -781,23 +996,27 @@ class Virtual_keyboard(Menu_widget):
 		pygame_key = Virtual_keyboard.getKeyFromChar(key)
 		if pygame_key:
 			pygame.event.post(pygame.event.Event(KEYDOWN, unicode=key, \
-				key=pygame_key, mod=0))
+				key=pygame_key, mod=0, timestamp=time.perf_counter()))
 
 	def onKeyRelease(self, key):
 		pygame_key = Virtual_keyboard.getKeyFromChar(key)
 		if pygame_key:
 			pygame.event.post(pygame.event.Event(KEYUP, unicode=key, \
-				key=pygame_key, mod=0))
+				key=pygame_key, mod=0, timestamp=time.perf_counter()))
 
 	def update(self):
 		if self.isShowing:
 			Menu_widget.update(self)
 
 	def show(self):
-		self.isShowing = True
+		if not self.isShowing:
+			self.isShowing = True
+			self.markDirty()
 
 	def hide(self):
-		self.isShowing = False
+		if self.isShowing:
+			self.isShowing = False
+			self.markDirty()
 
 	@staticmethod
 	def getKeyFromChar(char):
@@ -954,6 +1173,7 @@ class Setting_bar(Eventable_widget):
 				else:
 					self.cursorPos = realPos[0] + self.kwargs["size"][0] \
 					- self.kwargs["cursorWidth"] / 2
+				self.markDirty()
 
 	def getValue(self):
 		realPos = self.getRealPos()
@@ -1105,8 +1325,7 @@ class Toast_widget(Text):
 		else:
 			self.first_bg_color_alpha = 0
 
-		self.id = random.random()
-		get_task_manager().add_task("fade_toast_%s" % self.id, self.fade_task)
+		get_task_manager().add_task(None, self.fade_task)
 
 	def fade(self, value):
 		r, g, b, a = self.kwargs["textColor"]
@@ -1114,7 +1333,7 @@ class Toast_widget(Text):
 		if a <= 0:
 			a = 0
 			get_view().remove_toast()
-			get_task_manager().remove_task("fade_toast_%s" % self.id)
+			get_task_manager().cancel(self.fade_task)
 		self.config(textColor=(r, g, b, a))
 		
 		if len(self.kwargs["backgroundColor"]) == 4:
@@ -1130,7 +1349,7 @@ class Toast_widget(Text):
 class Waiting_wheel(Image_widget):
 
 	DEFAULT_KWARGS = {
-		"wheelImage": join(Path.IMAGES, "waiting_wheel", "{theme_color}.png"),
+		"wheelImage": join(Path.IMAGES, "waiting wheel", "{theme_color}.png"),
 		"rotationSpeed": 1
 	}
 
@@ -1149,12 +1368,17 @@ class Waiting_wheel(Image_widget):
 		self.is_rotating = False
 		self.last_time = 0
 
+	def refresh(self):
+		if self.is_rotating:
+			self.markDirty()
+
 	def update(self):
 		if self.is_rotating:
 			t = time.time()
 			deltatime = t - self.last_time
 			self.last_time = t
 			self.rotate(deltatime * self.kwargs["rotationSpeed"])
+		super().update()
 
 	def config(self, **kwargs):
 		if "wheelImage" in kwargs:
@@ -1255,6 +1479,7 @@ class Hiddable_list_widget(Button):
 			self.kwargs["listKwargs"]["backgroundImage"] = self.kwargs["backgroundImage"]
 
 		self.listWidget = List_widget(self.gui, self.getRealPos(), **self.kwargs["listKwargs"])
+		self.listWidget.parent = self
 		self.isOpened = False
 
 	def onEndClick(self):
@@ -1280,12 +1505,32 @@ class Hiddable_list_widget(Button):
 			self.listWidget.onEvent(event)
 		super().onEvent(event)
 
+	def isDirty(self):
+		if Button.isDirty(self):
+			return True
+		return self.isOpened and self.listWidget.isDirty()
+
+	def clean(self):
+		Button.clean(self)
+		self.listWidget.clean()
+
+	def getBounds(self):
+		if self.isOpened:
+			return Button.getBounds(self).union(self.listWidget.getBounds())
+		return Button.getBounds(self)
+
+	def needsPointerEvents(self):
+		return self.isOpened or super().needsPointerEvents()
+
 	def open(self):
-		self.isOpened = True
+		if not self.isOpened:
+			self.isOpened = True
+			self.markDirty()
 
 	def close(self):
 		if self.isOpened:
 			self.isOpened = False
+			self.markDirty()
 
 			if self.listWidget.selectedItem != None:
 				self.config(text=self.listWidget.selectedItem)
@@ -1314,6 +1559,9 @@ class Sub_gui(Widget):
 	def get_image(self, path, alpha=True):
 		return self.gui.get_image(path, alpha)
 
+	def get_writable_image(self, path, alpha=True):
+		return self.gui.get_writable_image(path, alpha)
+
 	def get_empty_image(self, size=(16, 16)):
 		return self.gui.get_empty_image(size)
 
@@ -1398,6 +1646,7 @@ class Scrollable_group(Menu_widget):
 			self.maxPos[3] = y + h
 
 		self.subWidgets[widgetName] = widget
+		self.indexSubWidget(widget)
 
 	def removeSubWidget(self, widgetName):
 		if widgetName in self.subWidgets:
@@ -1489,6 +1738,12 @@ class Scrollable_group(Menu_widget):
 		self.drawNavBars()
 		self.subGui.update()
 
+	def getBounds(self):
+		return self.getRect()
+
+	def needsPointerEvents(self):
+		return self.clicked or super().needsPointerEvents()
+
 
 class Editable_text(Scrollable_group):
 
@@ -1525,12 +1780,18 @@ class Editable_text(Scrollable_group):
 
 	def onClick(self):
 		self.is_typing = True
+		self.markDirty()
 		#request_keyboard()
 
 	def onClickOut(self):
-		self.is_typing = False
+		if self.is_typing:
+			self.is_typing = False
+			self.markDirty()
 		#close_keyboard()
 
+	def needsPointerEvents(self):
+		return self.is_typing or super().needsPointerEvents()
+
 	def onEvent(self, event):
 		super().onEvent(event)
 
@@ -1554,6 +1815,7 @@ class Editable_text(Scrollable_group):
 					self.kwargs["text"] = self.kwargs["text"][:-1]
 				elif event.key not in special_keys:
 					self.kwargs["text"] += event.unicode
+				self.markDirty()
 
 	def drawCursor(self):
 		if self.is_typing:
@@ -1,15 +1,14 @@
 # -*- coding: utf-8 -*-
 
-from lemapi_desktop.util import load_images, load_sounds, load_musics, \
-    load_settings, exit, save_settings
+from lemapi_desktop.util import decode_asset_pack, decode_images, \
+    decode_musics, decode_sounds, load_settings, exit, save_settings, \
+    set_asset_pack
 from lemapi_desktop.view import Desktop_view
 from lemapi_desktop.widget import App_widget
 
 __author__ = "Julien Dubois"
 __version__ = "0.1.0"
 
-import threading
-
 from lemapi.activity import Activity
 from lemapi.api import get_audio_player, get_gui, get_global_listener_manager, \
     get_task_manager, get_save_path, start_app, force_view_update, get_settings
@@ -18,7 +17,8 @@ from lemapi.audio import Mixer
 from lemapi.constants import Path, App
 from lemapi.event_manager import Event
 from lemapi.system_instance import Instance
-from lemapi.task_manager import Analog_task_delay, Task_delay
+from lemapi.task_manager import Background_job, Delay, Next_frame, \
+    Task_delay, Tween
 from lemapi.util import getusername, read_json
 
 from os.path import join
@@ -30,16 +30,14 @@ class Splash_activity(Activity):
         super().__init__(splash_view)
         self.mixer = None
         self.loaded = False
+        self.progress = 0
 
         self.init_events()
         self.load_splash_images()
         tm = get_task_manager()
 
         if App.SPLASH_ANIMATION:
-            tm.add_task("start_background_rotate", Task_delay(0.8, \
-                self.start_background_rotate))
-            tm.add_task("start_appear_title", Task_delay(3.8, \
-                self.start_appear_title))
+            tm.add_coroutine("splash_animation", self.run_splash_animation())
         else:
             self.appear_title(1)
             self.appear_loading(1)
@@ -47,7 +45,12 @@ class Splash_activity(Activity):
         load_settings()
         get_audio_player().set_volume(get_settings().get("sound_volume", 1))
         self.init_mixer()
-        threading.Thread(target=self.load_resources).start()
+        # The music is loaded first, to be started while the rest loads
+        tm.add_job(Background_job(decode_musics, \
+            callback=self.on_musics_loaded))
+        tm.add_job(Background_job(self.load_resources, \
+            callback=self.on_resources_loaded, \
+            progress_callback=self.set_progress))
 
     def init_events(self):
         lmgr = get_global_listener_manager()
@@ -70,25 +73,50 @@ class Splash_activity(Activity):
         self.mixer = Mixer(ap)
         ap.add_mixer(self.mixer)
 
-    def load_resources(self):
-        load_musics()
+    def load_resources(self, progress):
+        # Run by a worker of the task manager: resources are only decoded,
+        # they are published on the main loop by on_resources_loaded
+        pack = decode_asset_pack()
+        sounds = decode_sounds(pack)
+        images = decode_images(pack, progress=lambda done, total: \
+            progress(done / total))
+        return pack, sounds, images
+
+    def on_musics_loaded(self, musics):
+        get_audio_player().add_sounds(musics)
         self.start_music()
-        load_sounds()
-        load_images()
+
+    def on_resources_loaded(self, result):
+        pack, sounds, images = result
+        set_asset_pack(pack)
+        get_audio_player().add_sounds(sounds)
+        get_gui().add_images(images)
         self.loaded = True
 
+    def set_progress(self, progress):
+        self.progress = progress
+
     def start_music(self):
         music_path = join(Path.MUSICS, "startup_music.wav")
         music = get_audio_player().get_music(music_path)
         music.play()
         self.mixer.add_music(music)
 
+    async def run_splash_animation(self):
+        await Delay(0.8)
+        self.start_background_rotate()
+        await Delay(3)
+        await Tween(1.5, self.appear_title)
+
     def start_background_rotate(self):
         self.view.widgets["labyrinth_widget"].rotate = True
+        get_task_manager().add_coroutine("splash_rotation", \
+            self.rotate_background())
 
-    def start_appear_title(self):
-        get_task_manager().add_task("appear_title", Analog_task_delay(1.5, \
-            self.appear_title))
+    async def rotate_background(self):
+        labyrinth = self.view.widgets["labyrinth_widget"]
+        while True:
+            labyrinth.advance(await Next_frame())
 
     def appear_title(self, value):
         self.view.widgets["title_image"].set_opacity(value * 255)
@@ -96,6 +124,8 @@ class Splash_activity(Activity):
     def update(self, deltatime):
         if self.loaded:
             self.create_desktop()
+        else:
+            self.view.set_progress(self.progress)
         super().update(deltatime)
 
     def create_desktop(self):
@@ -106,8 +136,8 @@ class Splash_activity(Activity):
 
     def destroy(self):
         tm = get_task_manager()
-        tm.remove_task("start_background_rotate")
-        tm.remove_task("start_appear_title")
+        tm.remove_task("splash_animation")
+        tm.remove_task("splash_rotation")
         super().destroy()
 
 
@@ -5,12 +5,15 @@ __version__ = "0.1.0"
 
 import copy
 
-from lemapi.api import get_audio_player, get_gui, get_save_path
+from lemapi.api import get_audio_player, get_gui, get_save_path, get_theme_color
+from lemapi.asset_pack import get_pack_sources, open_asset_pack
+from lemapi.audio import Music, Sound
 from lemapi.constants import App, Path
+from lemapi.gui import Resource_loader
 from lemapi.util import read_json, write_json, exit as l_exit
 from lemapi.system_instance import Instance
 
-from os.path import join
+from os.path import join, splitext
 
 
 def load_settings():
@@ -32,40 +35,101 @@ def save_settings():
 		+ "saving LemAPI settings!")
 
 
-def load_images():
+def load_asset_pack():
+	set_asset_pack(decode_asset_pack())
+
+
+def decode_asset_pack():
+	if not App.ASSET_PACK_ENABLE:
+		return None
+
+	print("[lemapi] [INFO] [decode_asset_pack] Mapping asset pack")
+	return open_asset_pack(Path.ASSET_PACK, *get_pack_sources(Path.DATA))
+
+
+def set_asset_pack(pack):
+	get_gui().asset_pack = pack
+	get_audio_player().asset_pack = pack
+
+
+def load_images(all_themes=False, progress=None):
 	print("[lemapi] [INFO] [load_images] Loading images to RAM")
+	paths = get_image_paths(all_themes)
+	if paths is not None:
+		get_gui().load_images(paths, progress)
+
+
+def decode_images(pack=None, all_themes=False, progress=None):
+	# The images are returned for GUI.add_images, not published
+	paths = get_image_paths(all_themes)
+	if paths is None:
+		return {}
+	return Resource_loader(get_gui()).decode_images(paths, progress, pack)
+
+
+def get_image_paths(all_themes=False):
 	resources = read_json(join(Path.IMAGES, "resources.json"))
-	gui = get_gui()
+	theme_color = get_theme_color()
+	all_themes = all_themes or not get_gui().lazy_loading
 
 	if resources:
-		for resource in resources:
-			gui.load_image(join(Path.IMAGES, *resource))
-	else:
-		print("[lemapi] [WARNING] [load_images] No resources.json file found!")
+		# Images of the other themes are loaded by the GUI on first use
+		return [join(Path.IMAGES, *resource) for resource in resources \
+			if all_themes or get_resource_theme(resource) in (None, theme_color)]
+	print("[lemapi] [WARNING] [get_image_paths] No resources.json file found!")
+	return None
+
+
+def get_resource_theme(resource):
+	for name in resource:
+		name = splitext(name)[0]
+		if name in App.THEME_COLORS:
+			return name
+	return None
 
 
 def load_sounds():
-	print("[lemapi] [INFO] [load_sounds] Loading sounds to RAM")
+	get_audio_player().add_sounds(decode_sounds())
+
+
+def decode_sounds(pack=None):
+	print("[lemapi] [INFO] [decode_sounds] Loading sounds to RAM")
 	resources = read_json(join(Path.SOUNDS, "resources.json"))
 	ap = get_audio_player()
+	sounds = {}
 
 	if resources:
 		for resource in resources:
-			ap.load_sound(join(Path.SOUNDS, *resource))
+			path = join(Path.SOUNDS, *resource)
+			sounds[path] = Sound(ap)
+			if sounds[path].load(path, pack):
+				print("[lemapi] [INFO] [decode_sounds] Sound '%s' loaded" % path)
 	else:
-		print("[lemapi] [WARNING] [load_sounds] No resources.json file found!")
+		print("[lemapi] [WARNING] [decode_sounds] No resources.json file " \
+			+ "found!")
+	return sounds
 
 
 def load_musics():
-	print("[lemapi] [INFO] [load_musics] Loading musics to RAM")
+	get_audio_player().add_sounds(decode_musics())
+
+
+def decode_musics():
+	print("[lemapi] [INFO] [decode_musics] Loading musics to RAM")
 	resources = read_json(join(Path.MUSICS, "resources.json"))
 	ap = get_audio_player()
+	musics = {}
 
 	if resources:
 		for resource in resources:
-			ap.load_music(join(Path.MUSICS, *resource))
+			path = join(Path.MUSICS, *resource)
+			musics[path] = Music(ap)
+			if musics[path].load(path):
+				print("[lemapi] [INFO] [decode_musics] Music '%s' loaded" % path)
 	else:
-		print("[lemapi] [WARNING] [load_musics] No resources.json file found!")
+		print("[lemapi] [WARNING] [decode_musics] No resources.json file " \
+			+ "found!")
+	return musics
 
 
 def exit():
@@ -8,7 +8,7 @@ __version__ = "0.1.0"
 from lemapi.api import get_gui, get_listener_manager, start_app, get_theme_color, get_task_manager, get_activity
 from lemapi.constants import Path
 from lemapi.event_manager import Event
-from lemapi.task_manager import Analog_task_delay, Task_delay
+from lemapi.task_manager import Analog_task_delay, Delay, Tween
 from lemapi.util import read_json, resize_image
 from lemapi.view import View
 from lemapi.widget import Image_widget, Text
@@ -35,12 +35,19 @@ class Splash_view(View):
             transparentColor=(0, 0, 0))
         self.widgets["title_image"].set_opacity(0)
 
+    def set_progress(self, progress):
+        if self.toast and progress:
+            self.toast.text = "Demarrage de LemAPI... %d%%" % (progress * 100)
+
     def update(self):
         get_gui().draw_background_color((255, 255, 255))
         super().update()
 
 
 class Desktop_view(View):
+
+    RETAINED_MODE = True
+
     def __init__(self):
         super().__init__()
         self.temp_screen_surface = None
@@ -118,7 +125,6 @@ class Desktop_view(View):
             gui.draw_line((255, 255, 255), (0, 240 + h/2), (800, 240 + h/2), width=5)
 
     def start_appclose_transition(self):
-        task = Analog_task_delay(0.3, self.update_app_transition)
         gui = get_gui()
         splash_path = join(Path.IMAGES, "background", "{theme_color}.png")
         gui.load_image(splash_path)
@@ -126,12 +132,14 @@ class Desktop_view(View):
         self.in_animation = True
         self.temp_screen_surface = gui.get_current_surface()
         self.app_animation_surface = gui.get_image(splash_path)
-        get_task_manager().add_task("activity_transition_animation", task)
-
-        def end_animation():
-            self.in_animation = False
+        get_task_manager().add_coroutine("activity_transition_animation", \
+            self.run_appclose_transition())
 
-        get_task_manager().add_task("end_activity_transition", Task_delay(0.35, end_animation))
+    async def run_appclose_transition(self):
+        await Tween(0.3, self.update_app_transition)
+        await Delay(0.05)
+        self.in_animation = False
+        self.invalidate()
 
     def set_quit_view(self):
         w, h = get_gui().get_size()
@@ -5,15 +5,17 @@ __version__ = "0.1.0"
 
 import datetime
 import math
-import time
 
-from lemapi.api import get_task_manager, get_view, get_listener_manager
+from lemapi.api import get_task_manager, get_view, get_listener_manager, \
+    get_interpolation_alpha
 from lemapi.constants import Path
 from lemapi.task_manager import Analog_task_delay
-from lemapi.util import rotate_image, resize_image
+from lemapi.cache import spinner_cache
+from lemapi.util import rotate_round_image, resize_image
 from lemapi.widget import Menu_widget, Text, Widget, Eventable_widget, Image_widget
 
 from os.path import join
+from pygame.locals import MOUSEMOTION
 
 
 class App_widget(Menu_widget, Eventable_widget):
@@ -57,42 +59,66 @@ class Splash_labyrinth(Widget):
     def __init__(self, gui, pos, **kwargs):
         Splash_labyrinth.updateDefaultKwargs(kwargs)
         self.angle = 0
+        self.previous_angle = 0
         self.backgrounds = []
-        self.last_time = time.time()
         self.rotate = False
 
         super().__init__(gui, pos, **kwargs)
         self.load_backgrounds()
 
     def load_backgrounds(self):
-        self.backgrounds.append(resize_image(self.gui.get_image( \
-            self.kwargs["labyrinthPart1"]), self.kwargs["size"]))
-        self.backgrounds.append(resize_image(self.gui.get_image( \
-            self.kwargs["labyrinthPart2"]), self.kwargs["size"]))
-        self.backgrounds.append(resize_image(self.gui.get_image( \
-            self.kwargs["labyrinthPart3"]), self.kwargs["size"]))
+        for name in ("labyrinthPart1", "labyrinthPart2", "labyrinthPart3"):
+            self.backgrounds.append(self.crop_background(resize_image( \
+                self.gui.get_image(self.kwargs[name]), self.kwargs["size"])))
+
+    def crop_background(self, image):
+        # The rings are centered discs, the inner ones are cropped to their
+        # size so that their rotated frames are smaller
+        rect = image.get_bounding_rect()
+        center = image.get_rect().center
+        radius = max(abs(rect.left - center[0]), abs(rect.right - center[0]), \
+            abs(rect.top - center[1]), abs(rect.bottom - center[1]))
+        margin = max(0, min(image.get_size()) // 2 - radius)
+        return image.subsurface(image.get_rect().inflate(-2 * margin, \
+            -2 * margin)).copy()
+
+    def advance(self, deltatime):
+        # Called by the task manager, so that the rotation follows its time
+        self.previous_angle = self.angle
+        self.angle += deltatime * 250
 
     def update(self):
         if self.backgrounds:
-            if self.rotate:
-                elapsed = time.time() - self.last_time
-                self.angle += elapsed * 250
-
+            angle = self.previous_angle + (self.angle - self.previous_angle) \
+                * get_interpolation_alpha()
             w, h = self.kwargs["size"]
 
             for i in range(3):
                 x, y = self.getRealPos()
                 if i % 2:
-                    surface = rotate_image(self.backgrounds[i], int(self.angle))
+                    surface = rotate_round_image(self.backgrounds[i], angle)
                 else:
-                    surface = rotate_image(self.backgrounds[i], -int(self.angle))
+                    surface = rotate_round_image(self.backgrounds[i], -angle)
                 sw, sh = surface.get_size()
                 x -= (sw - w) / 2
                 y -= (sh - h) / 2
                 self.gui.draw_image(surface, (x, y))
-            self.last_time = time.time()
         super().update()
 
+    def refresh(self):
+        if self.rotate:
+            self.markDirty()
+
+    def destroy(self):
+        # Only the splash needs the frames of its rings
+        spinner_cache.clear()
+        super().destroy()
+
+    def getBounds(self):
+        # Rotated backgrounds overflow the widget up to its diagonal
+        rect = self.getRect()
+        return rect.inflate(rect.w * 0.5, rect.h * 0.5)
+
 
 class App_group(Eventable_widget):
 
@@ -106,6 +132,8 @@ class App_group(Eventable_widget):
         App_group.updateDefaultKwargs(kwargs)
         self.app_widgets = []
         self.background = None
+        # (angle, surface) of the last rotation, repaints at rest reuse it
+        self.rotated_background = None
         self.angle = 1
         self.last_mouse_pos = []
 
@@ -115,6 +143,7 @@ class App_group(Eventable_widget):
     def load_background(self):
         self.background = resize_image(self.gui.get_image( \
             self.kwargs["backgroundImage"]), self.kwargs["size"])
+        self.rotated_background = None
 
     def get_delta_angle(self):
         return 0.5 / self.kwargs["nbAppVisible"]
@@ -125,7 +154,7 @@ class App_group(Eventable_widget):
 
     def reset_angle(self):
         app_index = math.ceil(len(self.app_widgets) / 2)
-        self.angle = app_index * self.get_delta_angle() + 1/2
+        self.set_angle(app_index * self.get_delta_angle() + 1/2)
         print("[lemapi] [INFO] [App_group.reset_angle] Angle defined to %s radians" % \
             self.angle)
 
@@ -143,6 +172,7 @@ class App_group(Eventable_widget):
         if old_angle == self.angle:
             if app_index < len(self.app_widgets) - 1:
                 self.angle -= delta_angle
+        self.set_angle(self.angle)
 
     def previous_app(self):
         delta_angle = self.get_delta_angle()
@@ -158,6 +188,12 @@ class App_group(Eventable_widget):
         if old_angle == self.angle:
             if app_index > 0:
                 self.angle += delta_angle
+        self.set_angle(self.angle)
+
+    def set_angle(self, angle):
+        self.angle = angle
+        self.markDirty()
+        self.update_app_widgets()
 
     def add_app_widget(self, app_widget):
         if isinstance(app_widget, App_widget):
@@ -188,13 +224,23 @@ class App_group(Eventable_widget):
     def update_background(self):
         x, y = self.getRealPos()
         w, h = self.kwargs["size"]
-        surface = rotate_image(self.background, -self.angle * 180)
+        # The background only turns while the group is dragged or snapped
+        if not self.rotated_background \
+        or self.rotated_background[0] != self.angle:
+            self.rotated_background = (self.angle, rotate_round_image( \
+                self.background, -self.angle * 180))
+        surface = self.rotated_background[1]
 
         sw, sh = surface.get_size()
         x -= (sw - w) / 2
         y -= (sh - h) / 2
         self.gui.draw_image(surface, (x, y))
 
+    def getBounds(self):
+        # The rotated background overflows the widget up to its diagonal
+        rect = self.getRect()
+        return rect.inflate(rect.w * 0.5, rect.h * 0.5)
+
     def update_angle(self):
         if self.clicked and self.last_mouse_pos:
             try:
@@ -211,18 +257,18 @@ class App_group(Eventable_widget):
                     self.angle = max_angle
                 elif self.angle < min_angle:
                     self.angle = min_angle
+                self.set_angle(self.angle)
             except ValueError:
                 print("[lemapi] [WARNING] [App_group.update_angle] Bad position" \
                     + " (math domain error)")
             self.last_mouse_pos = list(self.lastEvent.pos)
 
-    def onHover(self):
-        self.update_angle()
-        super().onHover()
+    def onEvent(self, event):
+        super().onEvent(event)
 
-    def onEndHover(self):
-        self.update_angle()
-        super().onEndHover()
+        # Dragging continues out of the widget, hover changes are not enough
+        if event.type == MOUSEMOTION and self.kwargs["enable"]:
+            self.update_angle()
 
     def onClick(self):
         self.last_mouse_pos = list(self.lastEvent.pos)
@@ -250,9 +296,12 @@ class Clock_widget(Text):
         Clock_widget.updateDefaultKwargs(kwargs)
         super().__init__(gui, pos, "00:00", **kwargs)
 
-    def update(self):
+    def refresh(self):
         dt = datetime.datetime.now()
         self.text = "%02d:%02d" % (dt.hour, dt.minute)
+
+    def update(self):
+        self.refresh()
         super().update()
 
 
@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from lemapi.api import stop_all_activities
+from lemapi.api import get_control_sampler, start_latency_tracer, \
+    start_profiler, stop_all_activities
 from lemapi.audio import Player
-from lemapi.constants import Path
-from lemapi.event_manager import Listener_manager
+from lemapi.constants import App, Path
+from lemapi.event_manager import Event_bus, Listener_manager
 from lemapi.gui import GUI
+from lemapi.loop import Main_loop
+from lemapi.replay import Input_player, Input_recorder
 from lemapi.system_instance import Instance
 from lemapi.task_manager import Task_manager
 from lemapi.util import exit
@@ -16,6 +19,7 @@ from lemapi_desktop.view import Splash_view
 __author__ = "Julien Dubois"
 __version__ = "0.1.0"
 
+import argparse
 import pygame
 import os
 import sys
@@ -25,10 +29,15 @@ from pygame.locals import K_LCTRL, K_ESCAPE
 
 
 def main():
+    args = parse_args()
+
     # LemAPI init
     try:
         print("[lemapi] [INFO] [main] Defining working directory ...")
         define_working_directory()
+        if args.headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
         print("[lemapi] [INFO] [main] Initializing pygame ...")
         pygame.init()
 
@@ -38,6 +47,26 @@ def main():
 
         print("[lemapi] [INFO] [main] Creating system Listener_manager ...")
         Instance.listener_manager = Listener_manager()
+        print("[lemapi] [INFO] [main] Creating system Event_bus ...")
+        Instance.event_bus = Event_bus()
+        if args.record:
+            print("[lemapi] [INFO] [main] Recording inputs to '%s' ..." % \
+                args.record)
+            Instance.event_bus.recorder = Input_recorder(args.record)
+        if args.replay:
+            # Control states are replayed, the controls are not sampled
+            print("[lemapi] [INFO] [main] Replaying inputs from '%s' ..." % \
+                args.replay)
+            Instance.event_bus.player = Input_player(args.replay, args.report)
+        elif App.GPIO_ENABLE:
+            print("[lemapi] [INFO] [main] Creating system Control_sampler ...")
+            get_control_sampler()
+        if args.trace_latency or App.LATENCY_TRACE:
+            print("[lemapi] [INFO] [main] Tracing input latency ...")
+            start_latency_tracer(args.trace_latency or App.LATENCY_TRACE)
+        if args.profile is not None:
+            print("[lemapi] [INFO] [main] Profiling frames ...")
+            start_profiler(args.profile or None)
         print("[lemapi] [INFO] [main] Creating system Task_manager ...")
         Instance.task_manager = Task_manager()
         print("[lemapi] [INFO] [main] Creating system audio Player ...")
@@ -48,7 +77,9 @@ def main():
         view = Splash_view()
         Instance.activities.append(Splash_activity(view))
 
-        clock = pygame.time.Clock()
+        print("[lemapi] [INFO] [main] Creating system Main_loop ...")
+        Instance.main_loop = Main_loop(args.loop_mode, args.fixed_step, \
+            args.max_fps)
     except Exception:
         print("[lemapi] [FATAL ERROR] [main] Something wrong happened on boot!")
         traceback.print_exc()
@@ -57,57 +88,7 @@ def main():
     # Loop
     print("[lemapi] [INFO] [main] Init complete ! An infinite loop is now" \
         +" running until the system stop")
-    while True:
-        pygame.event.pump()
-        deltatime = clock.tick() / 1000
-
-        # Listener manager update
-        try:
-            Instance.listener_manager.update()
-        except Exception:
-            if Instance.app:
-                print("[lemapi] [WARNING] [main] " \
-                    + "'%s' has stopped working " % Instance.app.get_name() \
-                    + "on an event call!")
-                traceback.print_exc()
-            else:
-                print("[lemapi] [FATAL ERROR] [main] LemAPI has stopped working" \
-                    + " because of an event call!")
-                traceback.print_exc()
-                exit()
-
-        # Task manager update
-        try:
-            Instance.task_manager.update(deltatime)
-        except Exception:
-            if Instance.app:
-                print("[lemapi] [WARNING] [main] " \
-                    + "'%s' has stopped working " % Instance.app.get_name() \
-                    + "on a task call!")
-                traceback.print_exc()
-            else:
-                print("[lemapi] [FATAL ERROR] [main] LemAPI has stopped working" \
-                    + " because of a task call!")
-                traceback.print_exc()
-                exit()
-
-        # Activity update
-        try:
-            Instance.activities[-1].update(deltatime)
-        except Exception:
-            if Instance.app:
-                print("[lemapi] [WARNING] [main] " \
-                    + "'%s' has stopped working " % Instance.app.get_name() \
-                    + "while updating its current activity!")
-                traceback.print_exc()
-            else:
-                print("[lemapi] [FATAL ERROR] [main] LemAPI has stopped working" \
-                    + " while updating the current activity!")
-                traceback.print_exc()
-                exit()
-
-        # Display update
-        Instance.gui.update()
+    Instance.main_loop.run()
 
 
 def define_working_directory():
@@ -115,6 +96,30 @@ def define_working_directory():
     os.chdir(dname)
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="LemAPI system")
+    parser.add_argument("--record", metavar="LOG", type=os.path.abspath, \
+        help="record the inputs of each frame to LOG")
+    parser.add_argument("--replay", metavar="LOG", type=os.path.abspath, \
+        help="replay the inputs recorded in LOG, then stop")
+    parser.add_argument("--report", metavar="FILE", type=os.path.abspath, \
+        help="write the frame times of the replay to FILE (JSON)")
+    parser.add_argument("--trace-latency", metavar="TARGET", \
+        help="write input latencies to TARGET, a file or udp://host:port")
+    parser.add_argument("--loop-mode", choices=("variable", "fixed"), \
+        help="update the tasks once per frame or by fixed steps")
+    parser.add_argument("--fixed-step", metavar="SECONDS", type=float, \
+        help="duration of a simulation step of the fixed loop mode")
+    parser.add_argument("--max-fps", metavar="FPS", type=float, \
+        help="maximal frame rate, 0 for no cap")
+    parser.add_argument("--profile", metavar="TRACE", nargs="?", const="", \
+        help="profile the frames with an overlay, writing a Chrome trace " \
+        + "to TRACE if given")
+    parser.add_argument("--headless", action="store_true", \
+        help="use the SDL dummy video and audio drivers")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     print("[lemapi] [INFO] Starting LemAPI...")
     main()